@@ -1,23 +1,17 @@
+import numpy as np
 from pygame import Rect
 
 
-class RectValuePair:
-    def __init__(self, rect: Rect, value: float):
-        self.rect = rect
-        self.value = value
-    
-    def clear(self):
-        self.value = 0
-
-    # get the distance in pixels
-    def distance_px(self, other: "RectValuePair") -> float:
-        dx = other.rect.centerx - self.rect.centerx
-        dy = other.rect.centery - self.rect.centery
-        return (dx ** 2 + dy ** 2) ** 0.5
-    
-    # get the distance in "cells"
-    def distance(self, other: "RectValuePair") -> float:
-        return self.distance_px(other) / self.rect.width
+def makeBrushKernel(depth: int = 2, falloff: float = 1.5) -> np.ndarray:
+    # luminance change for every cell within depth of the central cell,
+    # based on its distance (in cells) to the centre
+    offsets = np.arange(-depth, depth + 1)
+    distance = np.hypot(offsets[:, None], offsets[None, :])
+    kernel = np.clip(-(1 / falloff) * distance + 1, 0, 1)
+    # the central cell itself is set directly by draw()
+    kernel[depth, depth] = 0
+    return kernel
+
 
 class SquareGrid:
     def __init__(self,
@@ -25,8 +19,9 @@ class SquareGrid:
                  x_offset: int,
                  y_offset: int,
                  cell_size: int,
-                 value: int = 0):
-        
+                 value: int = 0,
+                 dtype=np.float32):
+
         self.sidelen = int(s)
 
         if self.sidelen <= 0:
@@ -36,39 +31,60 @@ class SquareGrid:
         self.y_offset = y_offset
         self.cell_size = cell_size
 
-        self.cells: list[RectValuePair] = []
+        # cell values live in a (sidelen, sidelen) array, row-major like the MNIST images;
+        # flat is a zero-copy view that can be passed to NeuralNetwork.forward directly
+        self.values = np.full((self.sidelen, self.sidelen), value, dtype=dtype)
+        self.flat = self.values.reshape(-1)
+
+        self.rects: list[Rect] = []
         for y in range(self.sidelen):
             for x in range(self.sidelen):
-                rect = Rect(x * self.cell_size + self.x_offset,
-                            y * self.cell_size + self.y_offset,
-                            cell_size,
-                            cell_size)
-                self.cells.append(RectValuePair(rect, value))
-        self.previous_cells: list[RectValuePair | None] = []
-        self.previous_cells_erased: list[RectValuePair | None] = []
+                self.rects.append(Rect(x * self.cell_size + self.x_offset,
+                                       y * self.cell_size + self.y_offset,
+                                       cell_size,
+                                       cell_size))
+
+        # bitmaps of cells that already received a brush stamp (drawing / erasing)
+        self.visited = np.zeros((self.sidelen, self.sidelen), dtype=bool)
+        self.visited_erased = np.zeros((self.sidelen, self.sidelen), dtype=bool)
+        # cells whose value changed since the last popDirty(), so only those get re-rendered
+        self.dirty = np.ones((self.sidelen, self.sidelen), dtype=bool)
+
+        self.brush_depth = 2
+        self.kernel = makeBrushKernel(self.brush_depth)
 
         self.last_rmb: bool | int = False
 
-    # getitem, setitem, len and iter allow SquareGrid to be used as an iterable
-    # as opposed to having to write SquareGrid.cells every time
-    def __getitem__(self, index: int) -> RectValuePair:
-        return self.cells[index]
-    
-    def __setitem__(self, index: int, value: int):
-        self.cells[index].value = value
+    # getitem, setitem, len and iter work on the flat cell values
+    def __getitem__(self, index: int) -> float:
+        return float(self.flat[index])
+
+    def __setitem__(self, index: int, value: float):
+        self.flat[index] = value
+        self.dirty.flat[index] = True
 
     def __len__(self) -> int:
-        return len(self.cells)
-    
+        return self.flat.size
+
     def __iter__(self):
-        return iter(self.cells)
-    
+        return iter(self.flat)
+
     def clear(self):
-        [cell.clear() for cell in self.cells]
-        self.previous_cells.clear()
-        self.previous_cells_erased.clear()
+        self.values.fill(0)
+        self.visited.fill(False)
+        self.visited_erased.fill(False)
+        self.dirty.fill(True)
         self.last_rmb = False
 
+    def isEmpty(self) -> bool:
+        return not self.values.any()
+
+    def popDirty(self) -> np.ndarray:
+        # flat indices of all cells changed since the last call
+        indices = np.flatnonzero(self.dirty)
+        self.dirty.fill(False)
+        return indices
+
     def mouseInGrid(self, mouse_pos: tuple[int, int]) -> bool:
         x, y = mouse_pos
         return (self.x_offset <= x < self.x_offset + self.sidelen * self.cell_size and
@@ -78,85 +94,46 @@ class SquareGrid:
         if not (0 <= x < self.sidelen and 0 <= y < self.sidelen):
             raise IndexError
         return x + y * self.sidelen
-    
+
     def indexTo2D(self, index: int) -> tuple[int, int]:
-        if not 0 <= index < len(self.cells):
+        if not 0 <= index < self.flat.size:
             raise IndexError
         y, x = divmod(index, self.sidelen)
         return x, y
-    
-    def getCellFrom2DIndex(self, x: int, y: int) -> RectValuePair:
-        return self.cells[self.indexFrom2D(x, y)]
 
-    def getCellFromMousePos(self, mouse_pos: tuple[int, int]) -> tuple[RectValuePair, int] | tuple[None, None]:
+    def getCellFromMousePos(self, mouse_pos: tuple[int, int]) -> tuple[int, int] | None:
         if not self.mouseInGrid(mouse_pos):
-            return None, None
+            return None
 
         x, y = mouse_pos
-        x -= self.x_offset
-        y -= self.y_offset
-
-        grid_x = x // self.cell_size
-        grid_y = y // self.cell_size
-        
-        index = self.indexFrom2D(grid_x, grid_y)
-        return self.cells[index], index
-    
-    def getSurroundingCells(self, index: int, depth: int = 1) -> list[RectValuePair | None]:
-        x, y = self.indexTo2D(index)
-        
-        surrounding: list[RectValuePair | None] = []
-
-        # maybe optimizable but it works
-        for d in range(1, depth + 1):
-            corners = ((x - d, y - d),
-                       (x + d, y - d),
-                       (x + d, y + d),
-                       (x - d, y + d))
-            for i in range(4):                
-                for j in range(2*d):
-                    try:
-                        if i == 0:
-                            surrounding.append(self.getCellFrom2DIndex(corners[i][0] + j, corners[i][1]))
-                        elif i == 1:
-                            surrounding.append(self.getCellFrom2DIndex(corners[i][0], corners[i][1] + j))
-                        elif i == 2:
-                            surrounding.append(self.getCellFrom2DIndex(corners[i][0] - j, corners[i][1]))
-                        elif i == 3:
-                            surrounding.append(self.getCellFrom2DIndex(corners[i][0], corners[i][1] - j))
-                    except IndexError:
-                        surrounding.append(None)
-        
-        return surrounding
-    
+        return ((x - self.x_offset) // self.cell_size,
+                (y - self.y_offset) // self.cell_size)
+
     def draw(self, mouse_pos: tuple[int, int], erase: bool = False):
-        c, index = self.getCellFromMousePos(mouse_pos)
-        if c is None or index is None:
-            return
-        c.value = 1 if not erase else 0
-        if c in self.previous_cells and not erase:
-            return
-        if c in self.previous_cells_erased and erase:
+        cell = self.getCellFromMousePos(mouse_pos)
+        if cell is None:
             return
+        x, y = cell
+        self.values[y, x] = 1 if not erase else 0
+        self.dirty[y, x] = True
 
-        surrounding = self.getSurroundingCells(index, 2)
-        
-        # saving the cell in previous_cells is required
+        # marking the cell as visited is required
         # to avoid continuously "redrawing" the cell every
         # frame, which would cause it to go fully white very quickly
+        visited = self.visited if not erase else self.visited_erased
+        if visited[y, x]:
+            return
+        visited[y, x] = True
+
+        # stamp the brush kernel, cropped at the grid borders
+        d = self.brush_depth
+        y0, y1 = max(y - d, 0), min(y + d + 1, self.sidelen)
+        x0, x1 = max(x - d, 0), min(x + d + 1, self.sidelen)
+        region = self.values[y0:y1, x0:x1]
+        self.dirty[y0:y1, x0:x1] = True
+        stamp = self.kernel[y0 - (y - d):y1 - (y - d), x0 - (x - d):x1 - (x - d)]
         if not erase:
-            self.previous_cells.append(c)
+            region += stamp
         else:
-            self.previous_cells_erased.append(c)
-
-        for i, sc in enumerate(surrounding):
-            if sc is None:
-                continue
-
-            # determine luminance change based on
-            # distance to central cell
-            falloff = 1.5
-            change = -(1 / falloff) * sc.distance(c) + 1
-            change = max(0, min(change, 1))  # clamp to 0-1
-            sc.value += change if not erase else -change
-            sc.value = max(0, min(sc.value, 1))  # clamp to 0-1
+            region -= stamp
+        np.clip(region, 0, 1, out=region)  # clamp to 0-1
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import numpy as np
+
+
+# runs nn.forward on a background thread so the frame time does not depend on the model size;
+# only the most recent grid snapshot is processed, older ones are overwritten before they run
+class InferenceWorker:
+    def __init__(self, nn, size: int, min_interval: float = 0.0, incremental: bool = True):
+        self.nn = nn
+        # minimum time in seconds between the start of two inferences
+        self.min_interval = min_interval
+        # between two snapshots only a few cells change while drawing, so the first layer
+        # is updated incrementally from the changed cells instead of recomputed
+        self.session = nn.incremental_session() if incremental else None
+
+        # submit() writes into _snapshot, the worker copies it into _input before running
+        self._snapshot = np.zeros(size, dtype=nn.dtype)
+        self._input = np.zeros(size, dtype=nn.dtype)
+
+        self._condition = threading.Condition()
+        self._seq = 0  # sequence number of the latest snapshot
+        self._valid_from = 0  # results older than this were discarded
+        self._pending = False
+        self._stopped = False
+        self._last_start = float("-inf")
+
+        self._result: tuple[float, ...] | None = None
+        self._result_seq = -1
+        self._polled_seq = -1
+        self._error: BaseException | None = None
+
+        self._thread = threading.Thread(target=self._run, name="InferenceWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, values: np.ndarray) -> int:
+        # replaces any snapshot that has not been picked up yet (latest wins)
+        with self._condition:
+            np.copyto(self._snapshot, values, casting="unsafe")
+            self._seq += 1
+            self._pending = True
+            self._condition.notify()
+            return self._seq
+
+    def discard(self):
+        # drops the pending snapshot and all results of earlier snapshots, e.g. after clearing the grid
+        with self._condition:
+            self._pending = False
+            self._valid_from = self._seq + 1
+
+    def poll(self) -> tuple[float, ...] | None:
+        # returns the probabilities of the latest completed inference if they are new, None otherwise
+        with self._condition:
+            if self._error is not None:
+                raise RuntimeError("Inference worker failed.") from self._error
+            if self._result_seq <= self._polled_seq or self._result_seq < self._valid_from:
+                return None
+            self._polled_seq = self._result_seq
+            return self._result
+
+    def close(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    while True:
+                        if self._stopped:
+                            return
+                        if self._pending:
+                            # respect the minimum interval between inferences,
+                            # snapshots submitted meanwhile replace this one
+                            wait = self._last_start + self.min_interval - time.perf_counter()
+                            if wait <= 0:
+                                break
+                            self._condition.wait(wait)
+                        else:
+                            self._condition.wait()
+                    np.copyto(self._input, self._snapshot)
+                    seq = self._seq
+                    self._pending = False
+                    self._last_start = time.perf_counter()
+
+                if self.session is not None:
+                    self.session.set(self._input)
+                    probabilities = self.session.forward()
+                else:
+                    probabilities = self.nn.forward(self._input)
+                output = tuple(float(p) for p in probabilities[:, 0])
+
+                with self._condition:
+                    self._result = output
+                    self._result_seq = seq
+        except BaseException as e:
+            with self._condition:
+                self._error = e
@@ -1,11 +1,12 @@
 import pygame as pg
 from grid import SquareGrid
 import sys
-from os.path import abspath, dirname, join
+from os.path import abspath, dirname, exists, join
 ROOT = abspath(join(dirname(__file__), '..'))
 sys.path.append(ROOT)
 from neural_network import NeuralNetwork
 from texttowindow import putText, Anchor
+from inference_worker import InferenceWorker
 import traceback
 
 try:
@@ -34,16 +35,43 @@ try:
     h_padding = 20
     v_padding = 20
     grid_origin = (h_padding, (HEIGHT - grid_wh_px) // 2)
-
-    # initialize grid
-    grid = SquareGrid(grid_w, *grid_origin, cell_size)
-
-    nn = NeuralNetwork([784, 64, 32, 10]) # [784, 64, 32, 10] will be overridden by load() anyways
-    nn.load(f"{ROOT}/Neural_Network.npz") # type: ignore
+    # minimum time between two inferences of the background worker
+    inference_interval_ms = 20
+
+    # prefer the memory-mappable .nnm format, fall back to the .npz file
+    model_file = f"{ROOT}/Neural_Network.nnm"
+    if not exists(model_file):
+        model_file = f"{ROOT}/Neural_Network.npz"
+    nn = NeuralNetwork.from_file(model_file)
     update_nn = True
-    nn_input = [0] * (grid_w * grid_h)
     nn_output: tuple[float | str, ...] = tuple(1/10 for _ in range(10))
 
+    # initialize grid; its values share the network's dtype so that
+    # grid.flat can be fed to nn.forward without a copy
+    grid = SquareGrid(grid_w, *grid_origin, cell_size, dtype=nn.dtype)
+
+    # inference runs in the background on the most recent grid snapshot,
+    # the panel shows the latest completed result
+    worker = InferenceWorker(nn, grid_w * grid_h, inference_interval_ms / 1000)
+    grid_rect = pg.Rect(*grid_origin, grid_wh_px, grid_wh_px)
+
+    # the grid is rendered into its own surface and only the cells
+    # reported dirty by the grid are redrawn there (in surface coordinates)
+    grid_surface = pg.Surface(grid_rect.size)
+    local_rects = [rect.move(-grid_rect.x, -grid_rect.y) for rect in grid.rects]
+
+    help_text = """\
+Left click + drag do draw
+Right click + drag to erase
+Double right click to clear\
+"""
+
+    # everything right of the grid and above the help text,
+    # only redrawn when the output of the nn changes
+    panel_rect = pg.Rect(grid_rect.right + 1, 0, WIDTH - grid_rect.right - 1, HEIGHT)
+    full_redraw = True
+    update_panel = True
+
     # Main loop
     running = True
     while running:
@@ -52,6 +80,10 @@ try:
             if event.type == pg.QUIT:
                 running = False
 
+            # window contents were lost (e.g. window uncovered), redraw everything
+            if event.type in (pg.WINDOWEXPOSED, pg.VIDEOEXPOSE):
+                full_redraw = True
+
             # detect mouse dragging
             if event.type == pg.MOUSEMOTION:
                 if not any(event.buttons):
@@ -77,72 +109,94 @@ try:
                     continue
                 grid.last_rmb = now
 
-        grid_empty = all(cell.value == 0 for cell in grid)
-
-        if update_nn and not grid_empty:
-            # convert grid to expected format
-            nn_input = [float(cell.value) for cell in grid]
-            # run input through nn
-            nn_output = tuple(float(p[0]) for p in nn.forward(nn_input)) # type: ignore
+        new_output: tuple[float | str, ...] | None = None
+        if update_nn:
+            if not grid.isEmpty():
+                # hand a snapshot of the grid's flat (784,) view to the worker
+                worker.submit(grid.flat)
+            else:
+                worker.discard()
+                new_output = tuple("--" for _ in range(10))
         update_nn = False
 
-        if grid_empty:
-            nn_output = tuple("--" for _ in range(10))
-
-        # Draw everything
-        screen.fill(BG)  # Clear the screen
-
-        # loop through grid
-        for cell in grid:
-            pg.draw.rect(screen, BG.lerp(WHITE, cell.value), cell.rect)
-        
-        # draw bounding box
-        grid_rect = pg.Rect(*grid_origin, grid_wh_px, grid_wh_px)
-        pg.draw.rect(screen, WHITE, grid_rect, 2)
-
-        # generate text with all probabilities
-        probs_text = ""
-        for i, p in enumerate(nn_output):
-            percentage_or_str = f"{100 * p:.3f}" if isinstance(p, float) else p
-            probs_text += f"{i}:\t{percentage_or_str} %" + ("\n" if i < 9 else "")
-        probs_text = probs_text.expandtabs()
-        max_: int | str = nn_output.index(max(nn_output)) if not grid_empty else ""
-        # render text
-        max_index = max_ if isinstance(max_, int) else None
-        end_of_text = putText(probs_text,
-                              28,
-                              Anchor("tl", (grid_rect.right + h_padding, v_padding)),
-                              screen,
-                              line_spacing=4,
-                              hl_line=max_index)
-
-        # draw a square between probs_text and help_text
-        square_x = grid_rect.right + h_padding
-        square_size = WIDTH - h_padding - square_x
-        square_y = end_of_text.bottom + v_padding
-        pg.draw.rect(screen, WHITE, (square_x, square_y, square_size, square_size), 1)
-        # print the predicted digit in the center of the square
-        putText(str(max_),
-                int(1.1*square_size),
-                Anchor("c", (square_x + square_size // 2, square_y + square_size // 2)),
-                screen)
-        
-        # render help text
-        help_text = """\
-Left click + drag do draw
-Right click + drag to erase
-Double right click to clear\
-"""
-        putText(help_text,
-                22,
-                Anchor("bl", (grid_rect.right + h_padding, HEIGHT - v_padding)),
-                screen)
-
-        # swap framebuffers
-        pg.display.flip()
+        if new_output is None:
+            new_output = worker.poll()
+        if new_output is not None and new_output != nn_output:
+            nn_output = new_output
+            update_panel = True
+
+        # regions of the screen that have to be handed to the display this frame
+        dirty_rects: list[pg.Rect] = []
+
+        if full_redraw:
+            screen.fill(BG)  # Clear the screen
+
+            # render help text
+            help_top = putText(help_text,
+                               22,
+                               Anchor("bl", (grid_rect.right + h_padding, HEIGHT - v_padding)),
+                               screen).top
+            panel_rect.height = help_top - v_padding // 2
+
+        # redraw the changed cells into the cached grid surface
+        dirty_cells = grid.popDirty().tolist()
+        for index in dirty_cells:
+            pg.draw.rect(grid_surface, BG.lerp(WHITE, float(grid.flat[index])), local_rects[index])
+
+        if full_redraw or dirty_cells:
+            if full_redraw:
+                changed = grid_surface.get_rect()
+            else:
+                changed = local_rects[dirty_cells[0]].unionall([local_rects[i] for i in dirty_cells[1:]])
+            screen.blit(grid_surface, changed.move(grid_rect.topleft), changed)
+
+            # draw bounding box
+            pg.draw.rect(screen, WHITE, grid_rect, 2)
+            dirty_rects.append(changed.move(grid_rect.topleft))
+
+        if full_redraw or update_panel:
+            screen.fill(BG, panel_rect)
+
+            # generate text with all probabilities
+            probs_text = ""
+            for i, p in enumerate(nn_output):
+                percentage_or_str = f"{100 * p:.3f}" if isinstance(p, float) else p
+                probs_text += f"{i}:\t{percentage_or_str} %" + ("\n" if i < 9 else "")
+            probs_text = probs_text.expandtabs()
+            max_: int | str = nn_output.index(max(nn_output)) if isinstance(nn_output[0], float) else ""
+            # render text
+            max_index = max_ if isinstance(max_, int) else None
+            end_of_text = putText(probs_text,
+                                  28,
+                                  Anchor("tl", (grid_rect.right + h_padding, v_padding)),
+                                  screen,
+                                  line_spacing=4,
+                                  hl_line=max_index)
+
+            # draw a square between probs_text and help_text
+            square_x = grid_rect.right + h_padding
+            square_size = WIDTH - h_padding - square_x
+            square_y = end_of_text.bottom + v_padding
+            pg.draw.rect(screen, WHITE, (square_x, square_y, square_size, square_size), 1)
+            # print the predicted digit in the center of the square
+            putText(str(max_),
+                    int(1.1*square_size),
+                    Anchor("c", (square_x + square_size // 2, square_y + square_size // 2)),
+                    screen)
+            dirty_rects.append(panel_rect)
+            update_panel = False
+
+        # swap framebuffers, or only update the regions that changed
+        if full_redraw:
+            pg.display.flip()
+            full_redraw = False
+        elif dirty_rects:
+            pg.display.update(dirty_rects)
 
         # cap the frame rate
         clock.tick(60)
+
+    worker.close()
 except Exception:
     traceback.print_exc()
 finally:
@@ -1,8 +1,36 @@
+from collections import OrderedDict
 from pygame.font import Font
 from pygame import Color, Surface, Rect
 
 anchors = {"tl", "tr", "bl", "br", "c"}
 
+# fonts are cached by size, rendered lines by content, size and colours;
+# the line cache is bounded since the probability text changes constantly
+_fonts: dict[int, Font] = {}
+_line_surfaces: OrderedDict[tuple, Surface] = OrderedDict()
+LINE_CACHE_SIZE = 256
+
+def getFont(fontsize: int) -> Font:
+    font = _fonts.get(fontsize)
+    if font is None:
+        font = _fonts[fontsize] = Font(None, fontsize)  # use default font
+    return font
+
+def renderLine(line: str,
+               fontsize: int,
+               color: Color,
+               background: Color | None = None) -> Surface:
+    key = (line, fontsize, tuple(color), None if background is None else tuple(background))
+    surface = _line_surfaces.get(key)
+    if surface is not None:
+        _line_surfaces.move_to_end(key)
+        return surface
+    surface = getFont(fontsize).render(line, 1, color, background)
+    _line_surfaces[key] = surface
+    if len(_line_surfaces) > LINE_CACHE_SIZE:
+        _line_surfaces.popitem(last=False)
+    return surface
+
 # defines an anchor point for a block of text
 class Anchor:
     def __init__(self, type: str, pos: tuple[int, int]):
@@ -23,7 +51,7 @@ def putText(text: str,
     # dir = True if going from top to bottom line, False otherwise
     dir = True if anchor.type[0] != "b" else False
 
-    font = Font(None, fontsize)  # use default font
+    font = getFont(fontsize)
 
     text = text.strip()  # clean text
     lines = text.splitlines()  # pygame can't handle multiple lines
@@ -36,7 +64,7 @@ def putText(text: str,
 
     # render line by line
     for i, line in enumerate(lines[::(1 if dir else -1)]):
-        text_surface = font.render(line, 1, Color(0, 0, 0) if i == hl_line else color, hl_color if i == hl_line else None)
+        text_surface = renderLine(line, fontsize, Color(0, 0, 0) if i == hl_line else color, hl_color if i == hl_line else None)
         text_rect = text_surface.get_rect()
         new_pos = (x, y + line_height * (i if dir else -i))
         # adjust coordinates based on selected anchor type
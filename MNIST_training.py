@@ -1,54 +1,48 @@
 import numpy as np
 from neural_network import NeuralNetwork
+from dataset import MNISTDataset, BatchLoader
 
 
-data = np.load("mnist.npz")
-X_train = data["x_train"].reshape(60000, 784).T / 255.0  # (784, 60000)
-Y_train_labels = data["y_train"]
+# float32 halbiert den Speicherbedarf und beschleunigt die Matrixprodukte
+dtype = np.float32
 
-X_test = data["x_test"].reshape(10000, 784).T / 255.0
-Y_test_labels = data["y_test"]
+# Die Bilder bleiben als uint8 Memory-Map auf der Festplatte, normalisiert wird erst pro Batch
+train_set = MNISTDataset.from_npz("mnist.npz", "train")
+test_set = MNISTDataset.from_npz("mnist.npz", "test")
 
-def one_hot(y, num_classes=10):
-    return np.eye(num_classes)[y].T
+def train_neural_network(layer_sizes, train_set, test_set, learning_rate=0.001, epochs=50, train_samples=10000, step_decay_parameter=2, batch_size=None, optimizer=None, schedule=None, patience=None, validation_samples=5000, checkpoint=None):
+    model = NeuralNetwork(layer_sizes, dtype=dtype)
 
-Y_train = one_hot(Y_train_labels)
-Y_test = one_hot(Y_test_labels)
+    # Mit patience werden die letzten validation_samples Trainingsbilder als Validierungsset für Early Stopping abgetrennt
+    validation_data = None
+    if patience is not None:
+        train_set, validation_set = train_set.split(validation_samples)
+        validation_data = (validation_set.to_matrix(dtype), validation_set.labels)
 
-perm = np.random.permutation(X_train.shape[1])
-X_train = X_train[:, perm]
-Y_train = Y_train[:, perm]
-Y_train_labels = Y_train_labels[perm]
+    #Model Trainieren mit Trainingsdaten, der Loader mischt und lädt die Batches im Hintergrund
+    #(ohne das Validierungsset können es weniger als train_samples sein, der Report nennt die tatsächliche Anzahl)
+    loader = BatchLoader(train_set.subset(train_samples), batch_size=batch_size, dtype=dtype)
+    model.train(loader, epochs=epochs, learning_rate=learning_rate, print_loss=False, step_decay_parameter=step_decay_parameter, optimizer=optimizer, schedule=schedule,
+                validation_data=validation_data, patience=patience, checkpoint=checkpoint)
 
-def train_neural_network(layer_sizes, X_train, Y_train, Y_labels, X_test, Y_test_labels, learning_rate=0.001, epochs=50, train_samples=10000, step_decay_parameter=2):
-    model = NeuralNetwork(layer_sizes)
-
-    #Model Trainieren mit Trainingsdaten X_Train und die jeweiligen Lösungen
-    model.train(X_train[:, :train_samples], Y_train[:, :train_samples], epochs=epochs, learning_rate=learning_rate, print_loss=False, step_decay_parameter=step_decay_parameter)
-
-    #Test ausführen mit Testdaten X_Test und Y_Test
-    score = 0
-    for i in range(10000):
-        x = X_test[:, i].reshape(-1, 1)
-        output = model.forward(x)
-        predicted = np.argmax(output)
-        actual = Y_test_labels[i]
-        if predicted == actual:
-            score += 1
-
-    accuracy = score / 10000
+    #Test ausführen mit dem Testset
+    results = model.evaluate(test_set.to_matrix(dtype), test_set.labels)
+    accuracy = results["accuracy"]
     params = model.weights_counter + model.bias_counter
     efficiency = accuracy / params
 
     entry = (
         f"Architektur: {layer_sizes}\n"
         f"Genauigkeit: {accuracy:.4f}\n"
+        f"Genauigkeit pro Klasse: {np.round(results['per_class_accuracy'], 4).tolist()}\n"
         f"Anzahl Parameter: {params}\n"
         f"Parametereffizienz: {efficiency:.8e}\n"
         f"Learning Rate: {learning_rate}\n"
-        f"Epochs: {epochs}\n"
-        f"Train Samples: {train_samples}\n"
+        f"Epochs: {epochs} (trainiert: {model.epochs_trained})\n"
+        f"Train Samples: {len(loader.dataset)}\n"
         f"step_decay_parameter: {step_decay_parameter}\n"
+        f"Batch Size: {batch_size}\n"
+        f"Optimizer: {type(optimizer).__name__ if optimizer is not None else 'SGD'}\n"
         f"{'-'*40}\n"
     )
 
@@ -59,25 +53,16 @@ def train_neural_network(layer_sizes, X_train, Y_train, Y_labels, X_test, Y_test
     # Save model
     filename = f"network_{'_'.join(map(str, layer_sizes))}_ep{epochs}_lr{learning_rate:.4f}.npz"
     model.save(filename)
-    model.save(filename)
 
-#architectures = [
-    #[784, 32, 10],
-    #[784, 64, 10],
-    #[784, 128, 10],
-    #[784, 32, 32, 10],
-    #[784, 64, 32, 10],
-    #[784, 32, 32, 32, 10]
-#]
+# Sweeps über mehrere Architekturen bzw. Hyperparameter laufen parallel über sweep.py:
+#   python sweep.py --workers 4 --grid grid.json
+# (Ergebnisse landen in sweep_results.jsonl, bereits erledigte Konfigurationen werden übersprungen)
 
 
-epochs = 100
+epochs = 10
 learning_rate = 0.01
 step_decay_parameter = 1.68
-#for arch in architectures:
-    #train_neural_network(arch, X_train, Y_train, Y_train_labels, X_test, Y_test_labels, epochs=epochs, learning_rate=learning_rate)
-#for i in range(10):
-    #train_neural_network([784, 32, 10], X_train, Y_train, Y_train_labels, X_test, Y_test_labels, epochs=epochs, learning_rate=learning_rate, step_decay_parameter=step_decay_parameter)
-    #step_decay_parameter -= 0.02
+batch_size = 128
+train_samples = 60000
 
-train_neural_network([784, 64, 10], X_train, Y_train, Y_train_labels, X_test, Y_test_labels, epochs=epochs, learning_rate=learning_rate, step_decay_parameter=step_decay_parameter)
\ No newline at end of file
+train_neural_network([784, 64, 10], train_set, test_set, epochs=epochs, learning_rate=learning_rate, train_samples=train_samples, step_decay_parameter=step_decay_parameter, batch_size=batch_size)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from neural_network import NeuralNetwork
+from sparse_input import SparseBatch
+
+# Benchmarks auf synthetischen Daten in MNIST-Form (784 Pixel, ca. 19 % ungleich null, 10 Klassen),
+# es wird also kein Datensatz benötigt. Ergebnisse landen als JSON-Datei und können mit --compare
+# gegen eine gespeicherte Baseline verglichen werden.
+
+DEFAULT_LAYER_SIZES = [[784, 32, 10], [784, 64, 10], [784, 128, 10], [784, 64, 32, 10]]
+
+
+def synthetic_mnist(samples, seed=0, dtype=np.float32):
+	rng = np.random.default_rng(seed)
+	X = rng.random((784, samples), dtype=np.float32)
+	X[X < 0.81] = 0
+	labels = rng.integers(0, 10, samples)
+	return X.astype(dtype, copy=False), labels
+
+
+def measure(function, repeat=5, number=1):
+	# Median über mehrere Wiederholungen, jeweils number Aufrufe; Ergebnis in Sekunden pro Aufruf
+	function()
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for _ in range(number):
+			function()
+		times.append((time.perf_counter() - start) / number)
+	return float(np.median(times))
+
+
+def bench_network(layer_sizes, dtype, batch_size, epoch_samples, quick):
+	name = "-".join(map(str, layer_sizes))
+	np.random.seed(0)
+	model = NeuralNetwork(layer_sizes, dtype=dtype)
+	X, labels = synthetic_mnist(max(epoch_samples, 1000), dtype=dtype)
+	results = {}
+
+	x = X[:, 0].copy()
+	latency = measure(lambda: model.forward(x), repeat=5, number=100 if quick else 1000)
+	results[f"forward_latency[{name}]"] = {"value": latency * 1e6, "unit": "us", "higher_is_better": False}
+
+	X_batch = X[:, :1000]
+	batched = measure(lambda: model.forward(X_batch), repeat=5, number=5 if quick else 20)
+	results[f"forward_throughput[{name}]"] = {"value": 1000 / batched, "unit": "samples/s", "higher_is_better": True}
+
+	X_step, y_step = X[:, :batch_size].copy(), labels[:batch_size].copy()
+
+	def step():
+		model.backward(X_step, y_step)
+		model.update_parameters(0.0)
+	step_time = measure(step, repeat=5, number=10 if quick else 50)
+	results[f"backward_update[{name}]"] = {"value": step_time * 1e3, "unit": "ms", "higher_is_better": False}
+
+	X_epoch, y_epoch = X[:, :epoch_samples], labels[:epoch_samples]
+	epoch_time = measure(lambda: model.train(X_epoch, y_epoch, epochs=1, learning_rate=0.0, batch_size=batch_size),
+						 repeat=3)
+	results[f"train_epoch[{name}]"] = {"value": epoch_time * 1e3, "unit": "ms", "higher_is_better": False}
+	return results
+
+
+def bench_sparse(layer_sizes, dtype, batch_size, quick):
+	# Trainingsschritt (forward + backward) mit dense Input gegen SparseBatch bei steigendem Anteil aktiver Features.
+	# Der Crossover ist der größte gemessene Anteil, bei dem der SparseBatch noch schneller ist.
+	name = "-".join(map(str, layer_sizes))
+	np.random.seed(0)
+	model = NeuralNetwork(layer_sizes, dtype=dtype)
+	X, labels = synthetic_mnist(batch_size, dtype=dtype)
+	y = labels[:batch_size]
+	rng = np.random.default_rng(0)
+	ws = model.workspace(batch_size)
+
+	results = {}
+	crossover = 0.0
+	for fraction in (0.1, 0.25, 0.4, 0.5, 0.6, 0.75, 0.9, 1.0):
+		X_fraction = X.copy()
+		inactive = rng.permutation(X.shape[0])[int(fraction * X.shape[0]):]
+		X_fraction[inactive] = 0
+		X_sparse = SparseBatch.from_dense(X_fraction)
+
+		def step(X_batch):
+			model.forward_into(X_batch, ws)
+			model.backward(X_batch, y, ws)
+		dense = measure(lambda: step(X_fraction), repeat=5, number=5 if quick else 20)
+		sparse = measure(lambda: step(X_sparse), repeat=5, number=5 if quick else 20)
+		results[f"sparse_speedup[{name},{fraction:.2f}]"] = {"value": dense / sparse, "unit": "x", "higher_is_better": True}
+		if sparse < dense:
+			crossover = fraction
+	# Messpunkt statt Durchsatz: wird in compare() nur angezeigt, nicht als Regression gewertet
+	results[f"sparse_crossover[{name}]"] = {"value": crossover, "unit": "active", "higher_is_better": True,
+											"compare": False}
+	return results
+
+
+def bench_grid(quick):
+	# SquareGrid.draw ohne Fenster: ein Pinselstrich diagonal über das 28x28 Raster
+	os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+	sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "GUI"))
+	try:
+		from grid import SquareGrid
+	except ImportError as e:
+		print(f"GUI-Benchmark übersprungen ({e}).")
+		return {}
+
+	grid = SquareGrid(28, 20, 20, 20)
+	stroke = [(20 + p, 20 + p) for p in range(0, 560, 3)] + [(20 + p, 580 - p) for p in range(0, 560, 3)]
+
+	def draw_stroke():
+		grid.clear()
+		for pos in stroke:
+			grid.draw(pos)
+	stroke_time = measure(draw_stroke, repeat=5, number=2 if quick else 10)
+	return {"grid_draw_stroke": {"value": stroke_time * 1e6 / len(stroke), "unit": "us/draw", "higher_is_better": False}}
+
+
+def run(layer_sizes_list, dtype, batch_size, epoch_samples, quick):
+	results = {}
+	for layer_sizes in layer_sizes_list:
+		results.update(bench_network(layer_sizes, dtype, batch_size, epoch_samples, quick))
+		results.update(bench_sparse(layer_sizes, dtype, batch_size, quick))
+	results.update(bench_grid(quick))
+	return {
+		"meta": {
+			"python": platform.python_version(),
+			"numpy": np.__version__,
+			"platform": platform.platform(),
+			"dtype": np.dtype(dtype).name,
+			"batch_size": batch_size,
+			"epoch_samples": epoch_samples,
+			"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+		},
+		"results": results,
+	}
+
+
+def compare(current, baseline, threshold):
+	# Gibt die Namen der Benchmarks zurück, die um mehr als threshold (relativ) schlechter geworden sind
+	regressions = []
+	for name, result in current["results"].items():
+		if name not in baseline["results"]:
+			continue
+		old = baseline["results"][name]["value"]
+		new = result["value"]
+		if not result.get("compare", True) or old == 0:
+			print(f"{name:40s} {old:12.2f} -> {new:12.2f} {result['unit']:10s}")
+			continue
+		change = (new - old) / old
+		worse = -change if result["higher_is_better"] else change
+		flag = "REGRESSION" if worse > threshold else ("besser" if worse < -threshold else "")
+		print(f"{name:40s} {old:12.2f} -> {new:12.2f} {result['unit']:10s} {change:+7.1%} {flag}")
+		if worse > threshold:
+			regressions.append(name)
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmarks für forward, backward, Training und GUI-Zeichnen")
+	parser.add_argument("--output", default="benchmark_results.json")
+	parser.add_argument("--compare", help="Baseline-JSON, gegen die verglichen wird")
+	parser.add_argument("--threshold", type=float, default=0.10, help="erlaubte relative Verschlechterung")
+	parser.add_argument("--dtype", default="float32")
+	parser.add_argument("--batch-size", type=int, default=128)
+	parser.add_argument("--epoch-samples", type=int, default=10000)
+	parser.add_argument("--layer-sizes", type=json.loads, default=DEFAULT_LAYER_SIZES,
+						help='JSON-Liste von Architekturen, z.B. "[[784, 64, 10]]"')
+	parser.add_argument("--quick", action="store_true", help="weniger Wiederholungen")
+	args = parser.parse_args()
+
+	current = run(args.layer_sizes, np.dtype(args.dtype), args.batch_size, args.epoch_samples, args.quick)
+	with open(args.output, "w") as f:
+		json.dump(current, f, indent=2)
+
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+		regressions = compare(current, baseline, args.threshold)
+		if regressions:
+			print(f"{len(regressions)} Regression(en) gegenüber {args.compare}.")
+			sys.exit(1)
+	else:
+		for name, result in current["results"].items():
+			print(f"{name:40s} {result['value']:12.2f} {result['unit']}")
+	print(f"Ergebnisse gespeichert in {args.output}")
+
+
+if __name__ == "__main__":
+	main()
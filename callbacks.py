@@ -0,0 +1,90 @@
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class Callback:
+	# Basisklasse für Callbacks von NeuralNetwork.train. logs enthält loss, accuracy,
+	# learning_rate und samples_per_sec (pro Schritt bzw. pro Epoche).
+	def on_step_end(self, step, logs):
+		pass
+
+	def on_epoch_end(self, epoch, logs):
+		pass
+
+
+class PrintProgress(Callback):
+	# Das frühere fest eingebaute Verhalten von print_loss entspricht PrintProgress(every=5)
+	def __init__(self, every=1):
+		self.every = every
+
+	def on_epoch_end(self, epoch, logs):
+		if epoch % self.every == 0:
+			validation = f", Val Accuracy = {logs['val_accuracy']:.2%}" if "val_accuracy" in logs else ""
+			print(f"Epoch {epoch}: Loss = {logs['loss']:.4f}, Accuracy = {logs['accuracy']:.2%}{validation}")
+
+
+class History(Callback):
+	def __init__(self):
+		self.epochs = []
+
+	def on_epoch_end(self, epoch, logs):
+		self.epochs.append(dict(logs))
+
+
+class JSONLinesLogger(Callback):
+	# Schreibt die Metriken jeder Epoche (und optional jedes Schritts) als JSON-Zeile, z.B. für Dashboards
+	def __init__(self, filename, log_steps=False):
+		self.filename = filename
+		self.log_steps = log_steps
+
+	def _write(self, entry):
+		with open(self.filename, "a") as f:
+			f.write(json.dumps(entry) + "\n")
+
+	def on_step_end(self, step, logs):
+		if self.log_steps:
+			self._write({"type": "step", "step": step, **logs})
+
+	def on_epoch_end(self, epoch, logs):
+		self._write({"type": "epoch", "epoch": epoch, **logs})
+
+
+class LayerProfiler:
+	# Wird über model.profiler = LayerProfiler() aktiviert und misst pro Layer und Phase
+	# (forward / backward) Laufzeit, FLOPs und mit track_memory=True die neu allokierten Bytes
+	def __init__(self, track_memory=False):
+		self.track_memory = track_memory
+		if track_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		self.stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "flops": 0, "bytes": 0})
+		self._start = 0.0
+		self._memory = 0
+
+	def begin(self):
+		if self.track_memory:
+			tracemalloc.reset_peak()
+			self._memory = tracemalloc.get_traced_memory()[0]
+		self._start = time.perf_counter()
+
+	def end(self, phase, layer, flops):
+		seconds = time.perf_counter() - self._start
+		entry = self.stats[(phase, layer)]
+		entry["calls"] += 1
+		entry["seconds"] += seconds
+		entry["flops"] += flops
+		if self.track_memory:
+			entry["bytes"] += tracemalloc.get_traced_memory()[1] - self._memory
+
+	def reset(self):
+		self.stats.clear()
+
+	def report(self):
+		total = sum(entry["seconds"] for entry in self.stats.values()) or 1.0
+		lines = [f"{'Phase':10s} {'Layer':>5s} {'Aufrufe':>8s} {'Zeit [ms]':>10s} {'Anteil':>7s} {'GFLOP/s':>8s} {'MB alloc':>9s}"]
+		for (phase, layer), entry in sorted(self.stats.items()):
+			gflops = entry["flops"] / entry["seconds"] / 1e9 if entry["seconds"] else 0.0
+			lines.append(f"{phase:10s} {layer:5d} {entry['calls']:8d} {1000 * entry['seconds']:10.2f} "
+						 f"{entry['seconds'] / total:7.1%} {gflops:8.2f} {entry['bytes'] / 2 ** 20:9.2f}")
+		return "\n".join(lines)
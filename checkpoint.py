@@ -0,0 +1,69 @@
+import os
+import threading
+
+import numpy as np
+
+# Checkpoints während des Trainings: train() legt nur eine Kopie der Parameter (und des Optimizer-Zustands) an,
+# geschrieben wird in einem Hintergrund-Thread. Kommt ein neuer Checkpoint, bevor der vorherige geschrieben ist,
+# ersetzt er ihn, das Training wartet also nie auf die Festplatte. Die Datei wird atomar ersetzt
+# (temporäre Datei + os.replace), ein abgebrochener Job findet also immer einen vollständigen Checkpoint.
+
+
+def write_atomic(filename, arrays):
+	tmp_path = f"{filename}.{os.getpid()}.tmp"
+	with open(tmp_path, "wb") as f:
+		np.savez(f, **arrays)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp_path, filename)
+
+
+def load_checkpoint(filename):
+	# Alle Einträge als normale Arrays, die Datei ist danach wieder geschlossen
+	with np.load(filename, allow_pickle=False) as data:
+		return {key: data[key] for key in data}
+
+
+class CheckpointWriter:
+	def __init__(self, filename):
+		self.filename = filename
+		self.written = 0
+		self._pending = None
+		self._closed = False
+		self._error = None
+		self._condition = threading.Condition()
+		self._thread = threading.Thread(target=self._run, name="CheckpointWriter", daemon=True)
+		self._thread.start()
+
+	def submit(self, arrays):
+		# arrays muss eine eigene Kopie sein, die sich während des Schreibens nicht mehr ändert
+		with self._condition:
+			if self._error is not None:
+				raise RuntimeError(f"Checkpoint {self.filename} konnte nicht geschrieben werden.") from self._error
+			self._pending = arrays
+			self._condition.notify()
+
+	def close(self):
+		# Wartet, bis der letzte Checkpoint geschrieben ist
+		with self._condition:
+			self._closed = True
+			self._condition.notify()
+		self._thread.join()
+		if self._error is not None:
+			raise RuntimeError(f"Checkpoint {self.filename} konnte nicht geschrieben werden.") from self._error
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while self._pending is None and not self._closed:
+					self._condition.wait()
+				if self._pending is None:
+					return
+				arrays, self._pending = self._pending, None
+			try:
+				write_atomic(self.filename, arrays)
+				self.written += 1
+			except Exception as e:
+				with self._condition:
+					self._error = e
+				return
@@ -0,0 +1,187 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from sparse_input import MAX_ACTIVE_FRACTION, SparseBatch
+
+
+class MNISTDataset:
+	# Bilder bleiben als uint8 (N, 784) in einer Memory-Map auf der Festplatte,
+	# erst die einzelnen Batches werden in Gleitkommazahlen umgewandelt
+	def __init__(self, images, labels):
+		if len(images) != len(labels):
+			raise ValueError(f"Anzahl Bilder ({len(images)}) und Labels ({len(labels)}) stimmt nicht überein.")
+		self.images = images
+		self.labels = labels
+
+	@classmethod
+	def from_npy(cls, images_path, labels_path):
+		return cls(np.load(images_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r"))
+
+	@classmethod
+	def from_npz(cls, filename="mnist.npz", split="train", cache_dir=None):
+		# Beim ersten Aufruf wird mnist.npz einmalig in unkomprimierte .npy Dateien umgewandelt,
+		# die danach nur noch per Memory-Map geöffnet werden
+		stem = os.path.splitext(os.path.basename(filename))[0]
+		cache_dir = cache_dir if cache_dir is not None else os.path.dirname(os.path.abspath(filename))
+		images_path = os.path.join(cache_dir, f"{stem}_{split}_images.npy")
+		labels_path = os.path.join(cache_dir, f"{stem}_{split}_labels.npy")
+		# Größe und Änderungszeit der Quelldatei, mit der der Cache erstellt wurde. Passen sie nicht mehr
+		# (z.B. weil mnist.npz ersetzt wurde), wird der Cache neu angelegt.
+		source_path = os.path.join(cache_dir, f"{stem}_{split}_source.json")
+
+		cached = os.path.exists(images_path) and os.path.exists(labels_path)
+		if cached and os.path.exists(filename):
+			try:
+				with open(source_path) as f:
+					cached = json.load(f) == _source_signature(filename)
+			except (OSError, json.JSONDecodeError):
+				cached = False
+		if not cached:
+			with np.load(filename) as data:
+				images = data[f"x_{split}"]
+				_save_atomic(images_path, images.reshape(len(images), -1).astype(np.uint8, copy=False))
+				_save_atomic(labels_path, data[f"y_{split}"].astype(np.uint8, copy=False))
+			tmp_path = f"{source_path}.{os.getpid()}.tmp"
+			with open(tmp_path, "w") as f:
+				json.dump(_source_signature(filename), f)
+			os.replace(tmp_path, source_path)
+
+		return cls.from_npy(images_path, labels_path)
+
+	def __len__(self):
+		return len(self.labels)
+
+	@property
+	def num_features(self):
+		return self.images.shape[1]
+
+	def subset(self, count):
+		# Slices einer Memory-Map sind wieder Memory-Maps, es wird nichts kopiert
+		return MNISTDataset(self.images[:count], self.labels[:count])
+
+	def split(self, count):
+		# Die letzten count Samples abtrennen (z.B. als Validierungsset), ebenfalls ohne Kopie
+		if not 0 < count < len(self):
+			raise ValueError(f"Ungültige Größe {count} für das abgetrennte Set, erlaubt ist 1 bis {len(self) - 1}.")
+		return (MNISTDataset(self.images[:len(self) - count], self.labels[:len(self) - count]),
+				MNISTDataset(self.images[len(self) - count:], self.labels[len(self) - count:]))
+
+	def to_matrix(self, dtype=np.float32):
+		# Ganzer Datensatz als normalisierte (784, N) Matrix, z.B. für das Testset
+		return normalize(self.images, dtype)
+
+
+def _source_signature(filename):
+	stat = os.stat(filename)
+	return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _save_atomic(path, array):
+	# Erst in eine temporäre Datei schreiben, damit parallele Prozesse nie eine halbe Datei sehen
+	tmp_path = f"{path}.{os.getpid()}.tmp"
+	with open(tmp_path, "wb") as f:
+		np.save(f, array)
+	os.replace(tmp_path, path)
+
+
+def normalize(images, dtype=np.float32):
+	# uint8 (m, 784) -> normalisierte Spaltenmatrix (784, m)
+	X = np.empty((images.shape[1], images.shape[0]), dtype=dtype)
+	np.multiply(images.T, np.dtype(dtype).type(1 / 255), out=X)
+	return X
+
+
+def one_hot(labels, num_classes=10, dtype=np.float32):
+	Y = np.zeros((num_classes, len(labels)), dtype=dtype)
+	Y[labels, np.arange(len(labels))] = 1
+	return Y
+
+
+class BatchLoader:
+	# Liefert pro Epoche gemischte Mini-Batches (X, labels); ein Hintergrund-Thread bereitet
+	# die nächsten Batches vor, während der aktuelle trainiert wird
+	def __init__(self, dataset, batch_size=128, shuffle=True, dtype=np.float32, prefetch=2, one_hot=False, num_classes=10, seed=None,
+				 sparse=False, max_active_fraction=MAX_ACTIVE_FRACTION):
+		if len(dataset) == 0:
+			raise ValueError("Der Datensatz enthält keine Samples.")
+		self.dataset = dataset
+		self.batch_size = min(batch_size, len(dataset)) if batch_size is not None else len(dataset)
+		self.shuffle = shuffle
+		self.dtype = np.dtype(dtype)
+		self.prefetch = prefetch
+		# Standardmäßig werden Klassenlabels geliefert, One-Hot-Matrizen nur auf Wunsch
+		self.one_hot = one_hot
+		self.num_classes = num_classes
+		self.rng = np.random.default_rng(seed)
+		# Mit sparse=True werden Batches mit wenigen aktiven Pixeln als SparseBatch geliefert (siehe sparse_input.py),
+		# Batches mit mehr als max_active_fraction aktiven Pixeln bleiben dense
+		self.sparse = sparse
+		self.max_active_fraction = max_active_fraction
+
+	def __len__(self):
+		return -(-len(self.dataset) // self.batch_size)
+
+	def make_batch(self, idx):
+		# Sortierte Indizes lesen die Memory-Map möglichst sequentiell
+		idx = np.sort(idx)
+		images = self.dataset.images[idx]
+		active = np.flatnonzero(images.any(axis=0)) if self.sparse else None
+		if active is not None and len(active) <= self.max_active_fraction * images.shape[1]:
+			# Nur die aktiven Pixel werden normalisiert, der SparseBatch entsteht so im Loader-Thread
+			X = SparseBatch(active, normalize(images[:, active], self.dtype), images.shape[1])
+		else:
+			X = normalize(images, self.dtype)
+		labels = self.dataset.labels[idx].astype(np.intp)
+		if self.one_hot:
+			return X, one_hot(labels, self.num_classes, self.dtype)
+		return X, labels
+
+	@staticmethod
+	def _put(batches, item, stop):
+		# Mit Timeout warten, damit der Thread auf stop reagiert, wenn niemand mehr liest
+		while not stop.is_set():
+			try:
+				batches.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def _produce(self, order, batches, stop):
+		try:
+			for start in range(0, len(order), self.batch_size):
+				batch = self.make_batch(order[start:start + self.batch_size])
+				if not self._put(batches, batch, stop):
+					return
+			self._put(batches, None, stop)
+		except Exception as e:
+			self._put(batches, e, stop)
+
+	def __iter__(self):
+		n = len(self.dataset)
+		order = self.rng.permutation(n) if self.shuffle else np.arange(n)
+		if self.prefetch <= 0:
+			for start in range(0, n, self.batch_size):
+				yield self.make_batch(order[start:start + self.batch_size])
+			return
+
+		batches = queue.Queue(maxsize=self.prefetch)
+		stop = threading.Event()
+		worker = threading.Thread(target=self._produce, args=(order, batches, stop), daemon=True)
+		worker.start()
+		try:
+			while True:
+				batch = batches.get()
+				if batch is None:
+					return
+				if isinstance(batch, Exception):
+					raise batch
+				yield batch
+		finally:
+			# Falls die Schleife vorzeitig abgebrochen wird, den Thread beenden
+			stop.set()
+			worker.join()
@@ -0,0 +1,168 @@
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from neural_network import Classifier, NeuralNetwork
+
+# Mehrere Modelle mit derselben Architektur (z.B. die network_*.npz Dateien eines Sweeps) werden gestapelt:
+# W{i} wird zu (k, out, in), b{i} zu (k, out, 1). Alle k Modelle werden so in einem Durchlauf über das Testset
+# ausgewertet, statt jedes Modell einzeln zu laden und laufen zu lassen. Der teure erste Layer ist dabei ein
+# einziges großes Matrixprodukt, die weiteren Layer ein gebatchtes np.matmul.
+
+
+class ModelStack:
+	def __init__(self, layer_sizes, weights, biases, names=None):
+		self.layer_sizes = list(layer_sizes)
+		self.weights = weights
+		self.biases = biases
+		self.dtype = weights[0].dtype
+		self.names = list(names) if names is not None else [str(i) for i in range(len(weights[0]))]
+
+	@classmethod
+	def from_models(cls, models, names=None):
+		layer_sizes = list(models[0].layer_sizes)
+		for model in models[1:]:
+			if list(model.layer_sizes) != layer_sizes:
+				raise ValueError(f"Alle Modelle brauchen dieselbe Architektur: {layer_sizes} != {list(model.layer_sizes)}.")
+		dtype = np.result_type(*(model.dtype for model in models))
+		weights = [np.stack([model.parameters[f"W{i}"] for model in models]).astype(dtype, copy=False)
+				   for i in range(1, len(layer_sizes))]
+		biases = [np.stack([model.parameters[f"b{i}"] for model in models]).astype(dtype, copy=False)
+				  for i in range(1, len(layer_sizes))]
+		return cls(layer_sizes, weights, biases, names)
+
+	@classmethod
+	def from_files(cls, filenames):
+		return cls.from_models([NeuralNetwork.from_file(filename) for filename in filenames],
+							   [os.path.basename(filename) for filename in filenames])
+
+	def __len__(self):
+		return len(self.names)
+
+	def subset(self, indices):
+		indices = np.asarray(indices, dtype=np.intp)
+		return ModelStack(self.layer_sizes, [W[indices] for W in self.weights], [b[indices] for b in self.biases],
+						  [self.names[i] for i in indices])
+
+	def forward(self, X):
+		# X (784, m) -> Wahrscheinlichkeiten (k, 10, m) für alle k Modelle
+		X = np.asarray(X, dtype=self.dtype)
+		if X.ndim == 1:
+			X = X.reshape(-1, 1)
+		if X.shape[0] != self.layer_sizes[0]:
+			raise ValueError(
+				f"Falsche Input-Größe: erwartet {self.layer_sizes[0]} Eingänge, aber erhalten {X.shape[0]}.")
+
+		k, m = len(self), X.shape[1]
+		num_layers = len(self.weights)
+		A = X
+		for i in range(num_layers):
+			W = self.weights[i]
+			if i == 0:
+				# Alle Modelle sehen denselben Input: ein einziges Matrixprodukt (k * out, in) @ (in, m)
+				Z = np.dot(W.reshape(-1, W.shape[2]), A).reshape(k, W.shape[1], m)
+			else:
+				# (k, out, in) @ (k, in, m) -> (k, out, m)
+				Z = np.matmul(W, A)
+			Z += self.biases[i]
+			if i != num_layers - 1:
+				A = np.maximum(Z, 0, out=Z)
+		# Softmax pro Modell über die Klassen (Achse 1)
+		Z -= np.max(Z, axis=1, keepdims=True)
+		np.exp(Z, out=Z)
+		Z /= np.sum(Z, axis=1, keepdims=True) + 1e-8
+		return Z
+
+	def predict(self, X, batch_size=1000):
+		X = np.asarray(X)
+		if X.ndim == 1:
+			X = X.reshape(-1, 1)
+		m = X.shape[1]
+		predictions = np.empty((len(self), m), dtype=np.intp)
+		for start in range(0, m, batch_size):
+			predictions[:, start:start + batch_size] = np.argmax(self.forward(X[:, start:start + batch_size]), axis=1)
+		return predictions
+
+	def evaluate(self, X, labels, batch_size=1000):
+		# Wie NeuralNetwork.evaluate, aber mit einer zusätzlichen ersten Achse für die k Modelle
+		labels = np.asarray(labels)
+		if labels.ndim == 2:
+			labels = np.argmax(labels, axis=0)
+		predictions = self.predict(X, batch_size)
+		k = len(self)
+		num_classes = self.layer_sizes[-1]
+
+		# Konfusionsmatrizen aller Modelle mit einem bincount, Modell i belegt den Bereich ab i * num_classes**2
+		offsets = np.arange(k)[:, None] * num_classes * num_classes
+		confusion = np.bincount((offsets + labels * num_classes + predictions).ravel(),
+								minlength=k * num_classes * num_classes).reshape(k, num_classes, num_classes)
+		class_totals = confusion.sum(axis=2)
+		correct = np.diagonal(confusion, axis1=1, axis2=2)
+		per_class_accuracy = np.divide(correct, class_totals, out=np.zeros((k, num_classes)), where=class_totals > 0)
+
+		return {
+			"predictions": predictions,
+			"accuracy": correct.sum(axis=1) / len(labels),
+			"per_class_accuracy": per_class_accuracy,
+			"confusion_matrix": confusion,
+		}
+
+
+class Ensemble(Classifier):
+	# Mittelwert der Softmax-Ausgaben aller Modelle eines ModelStack, verwendbar wie ein NeuralNetwork
+	def __init__(self, stack):
+		self.stack = stack
+		self.layer_sizes = stack.layer_sizes
+		self.dtype = stack.dtype
+
+	def forward(self, X):
+		return self.stack.forward(X).mean(axis=0)
+
+
+def group_by_architecture(filenames):
+	# Dateien mit gleichen layer_sizes zusammenfassen, nur diese lassen sich stapeln
+	groups = {}
+	for filename in filenames:
+		model = NeuralNetwork.from_file(filename)
+		groups.setdefault(tuple(model.layer_sizes), []).append((filename, model))
+	return groups
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Mehrere Modelle gleichzeitig auf dem Testset auswerten und als Ensemble kombinieren")
+	parser.add_argument("models", nargs="*", help="Modelldateien (Standard: network_*.npz)")
+	parser.add_argument("--data", default="mnist.npz", help="MNIST-Datei mit dem Testset")
+	parser.add_argument("--top", type=int, default=None, help="nur die besten N Modelle pro Architektur ins Ensemble")
+	parser.add_argument("--batch-size", type=int, default=1000)
+	args = parser.parse_args()
+
+	filenames = args.models or sorted(glob.glob("network_*.npz"))
+	if not filenames:
+		parser.error("keine Modelldateien gefunden")
+
+	from dataset import MNISTDataset
+	test_set = MNISTDataset.from_npz(args.data, "test")
+	labels = np.asarray(test_set.labels)
+
+	for layer_sizes, entries in group_by_architecture(filenames).items():
+		stack = ModelStack.from_models([model for _, model in entries],
+									   [os.path.basename(filename) for filename, _ in entries])
+		X_test = test_set.to_matrix(stack.dtype)
+		results = stack.evaluate(X_test, labels, args.batch_size)
+		ranking = np.argsort(-results["accuracy"], kind="stable")
+
+		print(f"Architektur {list(layer_sizes)}: {len(stack)} Modelle")
+		for rank, i in enumerate(ranking, 1):
+			print(f"{rank:4d}. {results['accuracy'][i]:.4f}  {stack.names[i]}")
+
+		members = ranking[:args.top] if args.top else ranking
+		ensemble = Ensemble(stack.subset(members))
+		accuracy = ensemble.evaluate(X_test, labels, args.batch_size)["accuracy"]
+		print(f"Ensemble aus {len(members)} Modellen: {accuracy:.4f}")
+		print("-" * 40)
+
+
+if __name__ == "__main__":
+	main()
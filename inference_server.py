@@ -0,0 +1,202 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from neural_network import NeuralNetwork
+
+
+class MicroBatcher:
+	# Sammelt gleichzeitige Anfragen, bis max_batch_size erreicht oder max_wait_ms abgelaufen ist,
+	# und rechnet sie mit einem einzigen forward. Mit max_batch_size=1 wird jede Anfrage einzeln bearbeitet.
+	def __init__(self, model, max_batch_size=64, max_wait_ms=2.0, stats_window=10000):
+		self.model = model
+		self.max_batch_size = max_batch_size
+		self.max_wait = max_wait_ms / 1000
+		self.requests = queue.Queue()
+		self._batch = np.empty((model.layer_sizes[0], max_batch_size), dtype=model.dtype)
+
+		self._lock = threading.Lock()
+		self.latencies = deque(maxlen=stats_window)
+		self.completed = 0
+		self.batches = 0
+		self.started = time.perf_counter()
+
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def submit(self, x):
+		x = np.asarray(x, dtype=self.model.dtype).reshape(-1)
+		if x.size != self.model.layer_sizes[0]:
+			raise ValueError(f"Falsche Input-Größe: erwartet {self.model.layer_sizes[0]} Eingänge, aber erhalten {x.size}.")
+		future = Future()
+		with self._lock:
+			if self._stop.is_set():
+				raise RuntimeError("Der MicroBatcher wurde bereits geschlossen.")
+			self.requests.put((x, future, time.perf_counter()))
+		return future
+
+	def predict(self, x, timeout=None):
+		return self.submit(x).result(timeout)
+
+	def close(self):
+		with self._lock:
+			self._stop.set()
+		self._thread.join()
+		# Noch wartende Anfragen abbrechen, sonst warten die Handler-Threads für immer auf future.result()
+		while True:
+			try:
+				_, future, _ = self.requests.get_nowait()
+			except queue.Empty:
+				break
+			future.set_exception(RuntimeError("Der MicroBatcher wurde geschlossen, bevor die Anfrage bearbeitet wurde."))
+
+	def _collect(self):
+		try:
+			first = self.requests.get(timeout=0.1)
+		except queue.Empty:
+			return []
+		items = [first]
+		deadline = time.perf_counter() + self.max_wait
+		while len(items) < self.max_batch_size:
+			remaining = deadline - time.perf_counter()
+			try:
+				items.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+			except queue.Empty:
+				break
+		return items
+
+	def _run(self):
+		while not self._stop.is_set():
+			items = self._collect()
+			if not items:
+				continue
+			k = len(items)
+			for j, (x, _, _) in enumerate(items):
+				self._batch[:, j] = x
+			try:
+				probabilities = self.model.forward(self._batch[:, :k])
+			except Exception as e:
+				for _, future, _ in items:
+					future.set_exception(e)
+				continue
+
+			now = time.perf_counter()
+			for j, (_, future, submitted) in enumerate(items):
+				future.set_result(probabilities[:, j].copy())
+			with self._lock:
+				self.latencies.extend(now - submitted for _, _, submitted in items)
+				self.completed += k
+				self.batches += 1
+
+	def stats(self):
+		with self._lock:
+			latencies = np.array(self.latencies)
+			completed, batches = self.completed, self.batches
+		elapsed = time.perf_counter() - self.started
+		return {
+			"requests": completed,
+			"batches": batches,
+			"mean_batch_size": completed / batches if batches else 0.0,
+			"throughput": completed / elapsed if elapsed > 0 else 0.0,
+			"p50_ms": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+			"p99_ms": float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+		}
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+	# Keep-Alive, damit Clients nicht für jede Anfrage eine neue Verbindung aufbauen müssen
+	protocol_version = "HTTP/1.1"
+	# Header und Body werden getrennt geschrieben, ohne TCP_NODELAY bremst sonst Nagle + Delayed ACK
+	disable_nagle_algorithm = True
+
+	def _send_json(self, status, payload):
+		body = json.dumps(payload).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if self.path == "/stats":
+			self._send_json(200, self.server.batcher.stats())
+		else:
+			self._send_json(404, {"error": "not found"})
+
+	def do_POST(self):
+		if self.path != "/predict":
+			self._send_json(404, {"error": "not found"})
+			return
+		try:
+			request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+			# {"input": [784 Werte]} oder {"inputs": [[784 Werte], ...]}
+			inputs = request["inputs"] if "inputs" in request else [request["input"]]
+			futures = [self.server.batcher.submit(x) for x in inputs]
+			probabilities = [future.result() for future in futures]
+		except (ValueError, KeyError, TypeError) as e:
+			self._send_json(400, {"error": str(e)})
+			return
+		except RuntimeError as e:
+			# Server wird gerade beendet
+			self._send_json(503, {"error": str(e)})
+			return
+		self._send_json(200, {
+			"predictions": [int(np.argmax(p)) for p in probabilities],
+			"probabilities": [p.tolist() for p in probabilities],
+		})
+
+	def log_message(self, format, *args):
+		pass
+
+
+def start_server(model, host="127.0.0.1", port=8000, max_batch_size=64, max_wait_ms=2.0):
+	# Startet Server und Batcher im Hintergrund; port=0 wählt einen freien Port (server.server_address)
+	server = ThreadingHTTPServer((host, port), InferenceHandler)
+	server.daemon_threads = True
+	server.batcher = MicroBatcher(model, max_batch_size, max_wait_ms)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	return server
+
+
+def stop_server(server):
+	server.shutdown()
+	server.server_close()
+	server.batcher.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Lokaler Inferenz-Server mit dynamischem Micro-Batching")
+	parser.add_argument("--model", default="Neural_Network.npz")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8000)
+	parser.add_argument("--max-batch-size", type=int, default=64)
+	parser.add_argument("--max-wait-ms", type=float, default=2.0)
+	args = parser.parse_args()
+
+	model = NeuralNetwork.from_file(args.model)
+	server = start_server(model, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+	print(f"Server läuft auf http://{args.host}:{server.server_address[1]} (POST /predict, GET /stats)")
+	try:
+		while True:
+			time.sleep(10)
+			stats = server.batcher.stats()
+			if stats["requests"]:
+				print(f"{stats['requests']} Anfragen, {stats['throughput']:.0f}/s, Batch {stats['mean_batch_size']:.1f}, "
+					  f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+	except KeyboardInterrupt:
+		pass
+	finally:
+		stop_server(server)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,105 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+
+from inference_server import start_server, stop_server
+from neural_network import NeuralNetwork
+
+
+def _client(host, port, inputs, latencies, errors):
+	connection = http.client.HTTPConnection(host, port)
+	try:
+		for x in inputs:
+			body = json.dumps({"input": x.tolist()}).encode()
+			start = time.perf_counter()
+			connection.request("POST", "/predict", body, {"Content-Type": "application/json"})
+			response = connection.getresponse()
+			response.read()
+			if response.status != 200:
+				errors.append(response.status)
+				continue
+			latencies.append(time.perf_counter() - start)
+	finally:
+		connection.close()
+
+
+def run_load(host, port, clients=16, requests_per_client=200, seed=0):
+	# Mehrere gleichzeitige Clients, jeder schickt seine Anfragen nacheinander über eine Keep-Alive-Verbindung
+	rng = np.random.default_rng(seed)
+	latencies = []
+	errors = []
+	threads = [threading.Thread(target=_client,
+								args=(host, port, rng.random((requests_per_client, 784), dtype=np.float32), latencies, errors))
+			   for _ in range(clients)]
+
+	start = time.perf_counter()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	elapsed = time.perf_counter() - start
+
+	latencies = np.array(latencies)
+	# Wie MicroBatcher.stats(): ohne erfolgreiche Anfragen gibt es keine Perzentile
+	return {
+		"requests": len(latencies),
+		"errors": len(errors),
+		"throughput": len(latencies) / elapsed,
+		"p50_ms": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+		"p99_ms": float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+	}
+
+
+def _format_ms(value):
+	return f"{value:.2f} ms" if value is not None else "-"
+
+
+def _print_result(name, result, server_stats=None):
+	line = (f"{name}: {result['throughput']:.0f} Anfragen/s, p50 {_format_ms(result['p50_ms'])}, "
+			f"p99 {_format_ms(result['p99_ms'])}, Fehler {result['errors']}")
+	if server_stats is not None:
+		line += f", mittlere Batchgröße {server_stats['mean_batch_size']:.1f}"
+	print(line)
+
+
+def compare(model, clients, requests_per_client, max_batch_size, max_wait_ms):
+	# Derselbe Lasttest gegen einen Server ohne Batching (max_batch_size=1) und einen mit Micro-Batching
+	results = {}
+	for name, batch_size in (("einzeln", 1), ("gebatcht", max_batch_size)):
+		server = start_server(model, port=0, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+		try:
+			host, port = server.server_address[:2]
+			results[name] = run_load(host, port, clients, requests_per_client)
+			_print_result(name, results[name], server.batcher.stats())
+		finally:
+			stop_server(server)
+	if results["einzeln"]["throughput"] > 0:
+		print(f"Durchsatz-Gewinn durch Batching: {results['gebatcht']['throughput'] / results['einzeln']['throughput']:.2f}x")
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Lastgenerator für inference_server.py")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8000)
+	parser.add_argument("--clients", type=int, default=16)
+	parser.add_argument("--requests", type=int, default=200, help="Anfragen pro Client")
+	parser.add_argument("--compare", action="store_true",
+						help="eigene Server starten und einzelne gegen gebatchte Verarbeitung messen")
+	parser.add_argument("--model", default="Neural_Network.npz", help="Modell für --compare")
+	parser.add_argument("--max-batch-size", type=int, default=64)
+	parser.add_argument("--max-wait-ms", type=float, default=2.0)
+	args = parser.parse_args()
+
+	if args.compare:
+		compare(NeuralNetwork.from_file(args.model), args.clients, args.requests, args.max_batch_size, args.max_wait_ms)
+	else:
+		_print_result(f"{args.host}:{args.port}", run_load(args.host, args.port, args.clients, args.requests))
+
+
+if __name__ == "__main__":
+	main()
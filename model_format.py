@@ -0,0 +1,84 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+
+# Unkomprimiertes Modellformat (.nnm), das ohne Pickle und ohne Kopie per Memory-Map geladen werden kann:
+#   8 Byte   Magic b"NNMODEL\x01"
+#   4 Byte   Länge des JSON-Headers (uint32, little endian)
+#   n Byte   JSON-Header mit layer_sizes, dtype, Anzahl Parameter, Offset und CRC32 der Daten
+#   Padding  bis zur nächsten 64-Byte-Grenze
+#   Daten    der flache Parameterpuffer (W1, b1, W2, b2, ...) wie in NeuralNetwork.flat_parameters
+
+MODEL_EXTENSION = ".nnm"
+MAGIC = b"NNMODEL\x01"
+ALIGNMENT = 64
+
+
+def _align(n):
+	return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def write_model_file(filename, layer_sizes, flat):
+	flat = np.ascontiguousarray(flat)
+	# Immer little endian speichern, damit die Datei auf jeder Plattform gleich gelesen wird
+	flat = flat.astype(flat.dtype.newbyteorder("<"), copy=False)
+	header = {
+		"layer_sizes": [int(n) for n in layer_sizes],
+		"dtype": flat.dtype.str,
+		"count": int(flat.size),
+		"crc32": zlib.crc32(memoryview(flat).cast("B")),
+	}
+	# Der Offset hängt von der Headerlänge ab, deshalb großzügig für seine eigenen Ziffern reservieren
+	header["offset"] = _align(len(MAGIC) + 4 + len(json.dumps(header)) + 32)
+	header_bytes = json.dumps(header).encode()
+
+	with open(filename, "wb") as f:
+		f.write(MAGIC)
+		f.write(struct.pack("<I", len(header_bytes)))
+		f.write(header_bytes)
+		f.write(b"\0" * (header["offset"] - f.tell()))
+		f.write(memoryview(flat).cast("B"))
+
+
+def read_model_header(filename):
+	with open(filename, "rb") as f:
+		if f.read(len(MAGIC)) != MAGIC:
+			raise ValueError(f"{filename} ist keine gültige {MODEL_EXTENSION} Modelldatei.")
+		(length,) = struct.unpack("<I", f.read(4))
+		try:
+			header = json.loads(f.read(length))
+		except ValueError:
+			raise ValueError(f"Beschädigter Header in {filename}.") from None
+	for key in ("layer_sizes", "dtype", "count", "crc32", "offset"):
+		if key not in header:
+			raise ValueError(f"Header von {filename} enthält keinen Eintrag '{key}'.")
+	return header
+
+
+def read_model_file(filename, mmap=True, verify=True, mode="c"):
+	# Liefert (layer_sizes, flat). Mit mmap=True ist flat eine Memory-Map auf die Datei
+	# (mode "c": Änderungen bleiben im Speicher und landen nie in der Datei)
+	header = read_model_header(filename)
+	layer_sizes = header["layer_sizes"]
+	dtype = np.dtype(header["dtype"])
+	count = header["count"]
+
+	expected = sum(layer_sizes[i] * (layer_sizes[i - 1] + 1) for i in range(1, len(layer_sizes)))
+	if len(layer_sizes) < 2 or count != expected:
+		raise ValueError(f"{filename}: {count} Parameter passen nicht zu layer_sizes {layer_sizes}.")
+
+	if mmap:
+		try:
+			flat = np.memmap(filename, dtype=dtype, mode=mode, offset=header["offset"], shape=(count,))
+		except ValueError:
+			raise ValueError(f"{filename} ist kürzer als im Header angegeben.") from None
+	else:
+		flat = np.fromfile(filename, dtype=dtype, count=count, offset=header["offset"])
+		if flat.size != count:
+			raise ValueError(f"{filename} ist kürzer als im Header angegeben.")
+
+	if verify and zlib.crc32(memoryview(np.ascontiguousarray(flat)).cast("B")) != header["crc32"]:
+		raise ValueError(f"Prüfsumme von {filename} stimmt nicht, die Datei ist beschädigt.")
+	return layer_sizes, flat
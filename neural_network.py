@@ -1,42 +1,279 @@
+import os
+import time
+
 import numpy as np
 
+from callbacks import PrintProgress
+from checkpoint import CheckpointWriter, load_checkpoint
+from model_format import MODEL_EXTENSION, read_model_file, write_model_file
+from optimizers import StepDecay, optimizer_from_arrays, optimizer_to_arrays
+from sparse_input import SparseBatch
+
+
+def gather_columns(X, idx, out):
+	# Spalten X[:, idx] (bzw. Labels y[idx]) ohne Zwischenkopie in out schreiben (falls der dtype schon passt)
+	if X.dtype == out.dtype:
+		return np.take(X, idx, axis=-1, out=out)
+	out[...] = X[..., idx]
+	return out
+
+
+def layer_views(layer_sizes, buffer, w_key="W", b_key="b"):
+	# Zerlegt einen flachen 1-D Puffer in W{i}/b{i} Views (Reihenfolge W1, b1, W2, b2, ...)
+	views = {}
+	offset = 0
+	for i in range(1, len(layer_sizes)):
+		n_out, n_in = layer_sizes[i], layer_sizes[i - 1]
+		views[f"{w_key}{i}"] = buffer[offset:offset + n_out * n_in].reshape(n_out, n_in)
+		offset += n_out * n_in
+		views[f"{b_key}{i}"] = buffer[offset:offset + n_out].reshape(n_out, 1)
+		offset += n_out
+	if offset != buffer.size:
+		raise ValueError(f"Puffergröße {buffer.size} passt nicht zu layer_sizes {list(layer_sizes)} ({offset} Parameter).")
+	return views
+
+
+def parameter_count(layer_sizes):
+	return sum(layer_sizes[i] * (layer_sizes[i - 1] + 1) for i in range(1, len(layer_sizes)))
+
+
+class Workspace:
+	# Vorallokierte Puffer für Forward- und Backwardpropagation bei fester Batchgröße,
+	# damit ein Trainingsschritt keine neuen Arrays anlegen muss
+	def __init__(self, layer_sizes, batch_size, dtype):
+		m = batch_size
+
+		# Eingänge und Ziele eines gemischten Mini-Batches
+		self.X = np.empty((layer_sizes[0], m), dtype=dtype)
+		self.Y = np.empty((layer_sizes[-1], m), dtype=dtype)
+
+		# A[0] zeigt auf den aktuellen Input, A[i] sind die Aktivierungen von Layer i
+		self.A = [None] + [np.empty((n, m), dtype=dtype) for n in layer_sizes[1:]]
+		self.dZ = [None] + [np.empty((n, m), dtype=dtype) for n in layer_sizes[1:]]
+		self.masks = [None] + [np.empty((n, m), dtype=bool) for n in layer_sizes[1:-1]]
+		self.column = np.empty((1, m), dtype=dtype)
+		self.predictions = np.empty(m, dtype=np.intp)
+		# Klassenlabels eines Mini-Batches (bzw. argmax der One-Hot-Ziele) und Spaltenindizes für das Gather
+		self.labels = np.empty(m, dtype=np.intp)
+		self.columns = np.arange(m)
+
+
+class IncrementalSession:
+	# Inkrementelle Inferenz für einen einzelnen Input, der sich nur an wenigen Stellen ändert (z.B. beim Zeichnen):
+	# Z1 = W1 @ x + b1 wird gecacht und bei Änderungen nur um W1[:, idx] @ delta korrigiert, danach werden nur die
+	# (viel kleineren) folgenden Layer neu berechnet. Alle refresh_every Updates wird Z1 komplett neu berechnet,
+	# damit sich Rundungsfehler nicht aufsummieren. Die Parameter dürfen sich währenddessen nicht ändern.
+	def __init__(self, model, x=None, refresh_every=100, dense_fraction=0.25):
+		self.model = model
+		self.refresh_every = refresh_every
+		# Ab diesem Anteil geänderter Eingänge ist die komplette Neuberechnung günstiger
+		self.dense_fraction = dense_fraction
+		self.x = np.zeros(model.layer_sizes[0], dtype=model.dtype)
+		self.Z1 = np.empty((model.layer_sizes[1], 1), dtype=model.dtype)
+		self.updates = 0
+		self.reset(x)
+
+	def reset(self, x=None):
+		if x is None:
+			self.x.fill(0)
+		else:
+			self.x[...] = np.asarray(x, dtype=self.model.dtype).reshape(-1)
+		self.refresh()
+
+	def refresh(self):
+		np.dot(self.model.parameters["W1"], self.x.reshape(-1, 1), out=self.Z1)
+		self.Z1 += self.model.parameters["b1"]
+		self.updates = 0
+
+	def _apply(self, idx, delta):
+		# self.x enthält an den Stellen idx schon die neuen Werte, delta = neu - alt
+		self.updates += 1
+		if self.updates >= self.refresh_every or idx.size > self.dense_fraction * self.x.size:
+			self.refresh()
+		else:
+			self.Z1 += np.dot(self.model.parameters["W1"][:, idx], delta).reshape(-1, 1)
 
-class NeuralNetwork:
-	def __init__(self, layer_sizes):
+	def update(self, idx, delta):
+		# Eingänge x[idx] um delta ändern, mehrfache Indizes werden wie im Produkt W1[:, idx] @ delta aufsummiert
+		idx = np.asarray(idx, dtype=np.intp).reshape(-1)
+		if idx.size == 0:
+			return
+		delta = np.asarray(delta, dtype=self.model.dtype).reshape(-1)
+		np.add.at(self.x, idx, delta)
+		self._apply(idx, delta)
+
+	def set(self, x):
+		# Neuen Input übernehmen, nur die tatsächlich geänderten Eingänge werden verrechnet
+		x = np.asarray(x, dtype=self.model.dtype).reshape(-1)
+		if x.shape != self.x.shape:
+			raise ValueError(f"Falsche Input-Größe: erwartet {self.x.size} Eingänge, aber erhalten {x.size}.")
+		idx = np.flatnonzero(x != self.x)
+		if idx.size == 0:
+			return
+		delta = x[idx] - self.x[idx]
+		self.x[idx] = x[idx]
+		self._apply(idx, delta)
+
+	def forward(self):
+		# Wahrscheinlichkeiten (n_out, 1) für den aktuellen Input, wie NeuralNetwork.forward(x)
+		model = self.model
+		num_layers = len(model.layer_sizes) - 1
+		Z = self.Z1
+		for i in range(2, num_layers + 1):
+			Z = np.dot(model.parameters[f"W{i}"], model.relu(Z)) + model.parameters[f"b{i}"]
+		return model.softmax(Z)
+
+
+class Classifier:
+	# predict und evaluate für alles, was forward(X) -> Wahrscheinlichkeiten (n_out, m) sowie layer_sizes und dtype
+	# hat: NeuralNetwork, aber auch QuantizedNetwork (quantization.py) und Ensemble (ensemble.py)
+	def predict(self, X, batch_size=1000):
+		if isinstance(X, list):
+			X = np.array(X, dtype=self.dtype)
+		if len(X.shape) == 1:
+			X = X.reshape(-1, 1)
+
+		# Vorhersagen blockweise berechnen, damit der Speicher nur von batch_size abhängt
+		m = X.shape[1]
+		predictions = np.empty(m, dtype=np.intp)
+		for start in range(0, m, batch_size):
+			if isinstance(X, SparseBatch):
+				A = self.forward(X.columns(start, start + batch_size))
+			else:
+				A = self.forward(X[:, start:start + batch_size])
+			predictions[start:start + batch_size] = np.argmax(A, axis=0)
+		return predictions
+
+	def evaluate(self, X, labels, batch_size=1000):
+		labels = np.asarray(labels)
+		if labels.ndim == 2:
+			# One-Hot-Matrix in Klassenindizes umwandeln
+			labels = np.argmax(labels, axis=0)
+		predictions = self.predict(X, batch_size)
+		num_classes = self.layer_sizes[-1]
+
+		# Konfusionsmatrix: Zeile = tatsächliche Klasse, Spalte = vorhergesagte Klasse
+		confusion = np.bincount(labels * num_classes + predictions,
+								minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+		class_totals = confusion.sum(axis=1)
+		per_class_accuracy = np.divide(np.diag(confusion), class_totals,
+									   out=np.zeros(num_classes), where=class_totals > 0)
+
+		return {
+			"predictions": predictions,
+			"accuracy": np.trace(confusion) / len(labels),
+			"per_class_accuracy": per_class_accuracy,
+			"confusion_matrix": confusion,
+		}
+
+
+class NeuralNetwork(Classifier):
+	def __init__(self, layer_sizes, dtype=np.float64):
 		self.layer_sizes = layer_sizes
+		# Genauigkeit von Parametern, Aktivierungen und Gradienten (z.B. np.float32 für halben Speicher)
+		self.dtype = np.dtype(dtype)
 		self.parameters = self.create_network()
+		self._workspaces = {}
+		# Ohne Optimizer wird einfacher SGD verwendet
+		self.optimizer = None
+		# Optionaler callbacks.LayerProfiler für Laufzeit/FLOPs pro Layer, None = keine Messung
+		self.profiler = None
+		# Anzahl abgeschlossener Epochen (wird mitgespeichert und beim Fortsetzen aus einem Checkpoint übernommen)
+		self.epochs_trained = 0
 
 	def create_network(self):
-		self.bias_counter = 0
-		self.weights_counter = 0
+		# Alle Weights und Biases liegen in einem zusammenhängenden Puffer, W{i}/b{i} sind Views darauf
+		self.allocate_parameters()
 
 		# Weights und Biases generieren und einen zufälligen Wert geben.
-		parameters = {}
 		for i in range(1, len(self.layer_sizes)):
-			w_shape = (self.layer_sizes[i], self.layer_sizes[i - 1])
-			b_shape = (self.layer_sizes[i], 1)
+			self.parameters[f"W{i}"][...] = np.random.randn(self.layer_sizes[i], self.layer_sizes[i - 1]) * np.sqrt(2 / self.layer_sizes[i - 1])
+			self.parameters[f"b{i}"][...] = 0
+
+		return self.parameters
+
+	def allocate_parameters(self):
+		self.set_parameter_buffer(np.empty(parameter_count(self.layer_sizes), dtype=self.dtype))
 
-			parameters[f"W{i}"] = np.random.randn(self.layer_sizes[i], self.layer_sizes[i - 1]) * np.sqrt(2 / self.layer_sizes[i - 1])
-			parameters[f"b{i}"] = np.zeros((self.layer_sizes[i], 1))
+	def set_parameter_buffer(self, flat):
+		# Netzwerk auf einen bestehenden flachen Puffer setzen (z.B. Shared Memory oder Memory-Map)
+		self.flat_parameters = flat
+		self.parameters = layer_views(self.layer_sizes, flat)
+		self.set_grad_buffer(np.zeros(flat.size, dtype=flat.dtype))
 
-			self.weights_counter += w_shape[0] * w_shape[1]
-			self.bias_counter += b_shape[0]
+		self.weights_counter = sum(self.parameters[key].size for key in self.parameters if key[0] == "W")
+		self.bias_counter = flat.size - self.weights_counter
 
-		return parameters
+	def set_grad_buffer(self, flat):
+		self.flat_grads = flat
+		self.grads = layer_views(self.layer_sizes, flat, "dW", "db")
+
+	@classmethod
+	def from_buffer(cls, layer_sizes, flat, optimizer=None):
+		# Netzwerk direkt um einen vorhandenen Parameterpuffer bauen, ohne create_network aufzurufen
+		model = cls.__new__(cls)
+		model.layer_sizes = list(layer_sizes)
+		model.dtype = flat.dtype
+		model._workspaces = {}
+		model.optimizer = optimizer
+		model.profiler = None
+		model.epochs_trained = 0
+		model.set_parameter_buffer(flat)
+		return model
+
+	@classmethod
+	def from_file(cls, filename, mmap=True, verify=True):
+		# .nnm Dateien werden ohne Kopie per Memory-Map geladen, .npz Dateien ohne Pickle eingelesen
+		if filename.endswith(MODEL_EXTENSION):
+			layer_sizes, flat = read_model_file(filename, mmap=mmap, verify=verify)
+			return cls.from_buffer(layer_sizes, flat)
+
+		if not filename.endswith('.npz'):
+			filename += '.npz'
+		with np.load(filename, allow_pickle=False) as data:
+			if 'layer_sizes' not in data:
+				raise ValueError(f"{filename} enthält keine layer_sizes.")
+			layer_sizes = data['layer_sizes'].tolist()
+			if len(layer_sizes) < 2:
+				raise ValueError(f"{filename}: ungültige layer_sizes {layer_sizes}.")
+			# Ältere Dateien ohne gespeicherten dtype verwenden den dtype der Gewichte
+			dtype = np.dtype(str(data['dtype'])) if 'dtype' in data else data["W1"].dtype
+
+			model = cls.from_buffer(layer_sizes, np.empty(parameter_count(layer_sizes), dtype=dtype))
+			for key, view in model.parameters.items():
+				if key not in data:
+					raise ValueError(f"{filename} enthält keinen Eintrag {key}.")
+				if data[key].shape != view.shape:
+					raise ValueError(f"{filename}: {key} hat die Form {data[key].shape}, erwartet {view.shape}.")
+				view[...] = data[key]
+			model.optimizer = optimizer_from_arrays(data)
+			if 'epochs_trained' in data:
+				model.epochs_trained = int(data['epochs_trained'])
+		return model
 
 	def save(self, filename):
+		if filename.endswith(MODEL_EXTENSION):
+			# Unkomprimiertes, memory-mapbares Format (ohne Optimizer-Zustand)
+			write_model_file(filename, self.layer_sizes, self.flat_parameters)
+			return
+
 		# Datei Speichern als .npz file
 		if not filename.endswith('.npz'):
 			filename += '.npz'
-		np.savez(filename, **self.parameters, layer_sizes=np.array(self.layer_sizes))
+		# Der Zustand des Optimizers (z.B. Momente von Adam) wird mitgespeichert, damit das Training fortgesetzt werden kann
+		optimizer_state = optimizer_to_arrays(self.optimizer) if self.optimizer is not None else {}
+		np.savez(filename, **self.parameters, **optimizer_state, layer_sizes=np.array(self.layer_sizes), dtype=np.array(self.dtype.str),
+				 epochs_trained=np.array(self.epochs_trained))
 
 	def load(self, filename):
-		# .npz Datei Herunterladen
-		if not filename.endswith('.npz'):
-			filename += '.npz'
-		data = np.load(filename, allow_pickle=True)
-		self.parameters = {key: data[key] for key in data if key != 'layer_sizes'}
-		self.layer_sizes = data['layer_sizes'].tolist()
+		# Überschreibt dieses Netzwerk mit dem Inhalt der Datei (eigene Kopie der Parameter)
+		loaded = NeuralNetwork.from_file(filename, mmap=False)
+		self.layer_sizes = loaded.layer_sizes
+		self.dtype = loaded.dtype
+		self.optimizer = loaded.optimizer
+		self.epochs_trained = loaded.epochs_trained
+		self._workspaces = {}
+		self.set_parameter_buffer(loaded.flat_parameters)
 
 	@staticmethod
 	def relu(Z):
@@ -49,8 +286,7 @@ class NeuralNetwork:
 		return expZ / (np.sum(expZ, axis=0, keepdims=True) + 1e-8)
 
 	def forward(self, X):
-		if isinstance(X, list):
-			X = np.array(X)
+		X = self.as_input(X)
 		if len(X.shape) == 1:
 			# Array in Spaltenvektor umformen
 			X = X.reshape(-1, 1)
@@ -61,93 +297,318 @@ class NeuralNetwork:
 
 		A = X
 		num_layers = len(self.parameters) // 2
+		profiler = self.profiler
 
 		# Forwardpropagation, Berechnung der Aktivierung A bzw. Z nach der ReLU Funktion für jedes Layer
 		# Theoretisch wird jedes Aktivierungswert a berechnet als Summe von jedem Aktivierungswert vom vorherigen Layer mal ein weight w und einem bias
 		# Man kann alle diese Operationen vereinfacht als Matrixprodukt von der Matrix W mal dem Vektor A + dem Vektor b schreiben
 		for i in range(1, num_layers):
+			if profiler is not None:
+				profiler.begin()
 			W = self.parameters[f"W{i}"]
 			b = self.parameters[f"b{i}"]
-			Z = np.dot(W, A) + b
+			Z = (A.dot(W) if isinstance(A, SparseBatch) else np.dot(W, A)) + b
 			A = self.relu(Z)
+			if profiler is not None:
+				profiler.end("forward", i, 2 * W.size * A.shape[1])
 
 		# Letzter Forwardpropagationsschritt mit Softmax, um eine Wahrscheinlichkeit für eine bestimmte Zahl zu geben
+		if profiler is not None:
+			profiler.begin()
 		W = self.parameters[f"W{num_layers}"]
 		b = self.parameters[f"b{num_layers}"]
-		Z = np.dot(W, A) + b
+		Z = (A.dot(W) if isinstance(A, SparseBatch) else np.dot(W, A)) + b
 		A = self.softmax(Z)
+		if profiler is not None:
+			profiler.end("forward", num_layers, 2 * W.size * A.shape[1])
 
 		return A
 
-	def compute_loss(self, A, Y):
+	def incremental_session(self, x=None, refresh_every=100, dense_fraction=0.25):
+		return IncrementalSession(self, x, refresh_every, dense_fraction)
+
+	def as_input(self, X):
+		# Inputs als Array im dtype des Netzwerks, ein SparseBatch (siehe sparse_input.py) wird direkt verwendet
+		if isinstance(X, SparseBatch):
+			if X.dtype != self.dtype:
+				return SparseBatch(X.active, X.values.astype(self.dtype), X.num_features)
+			return X
+		return np.asarray(X, dtype=self.dtype)
+
+	def targets(self, Y):
+		# Ziele sind entweder Klassenlabels (m,) oder One-Hot-Vektoren (10, m)
+		if np.ndim(Y) == 1:
+			return np.asarray(Y, dtype=np.intp)
+		return np.asarray(Y, dtype=self.dtype)
+
+	def compute_loss(self, A, Y, out=None):
 		# Verlust berechnen mit der Cross Entropy Loss Funktion
+		if Y.ndim == 1:
+			# Bei Labels nur die Log-Wahrscheinlichkeit der richtigen Klasse jeder Spalte einsammeln
+			m = Y.shape[0]
+			return -np.sum(np.log(A[Y, np.arange(m)] + 1e-8)) / m
 		m = Y.shape[1]  # Anzahl Spalten im Ergebnisvektor Y
-		return -np.sum(Y * np.log(A + 1e-8)) / m
+		if out is None:
+			return -np.sum(Y * np.log(A + 1e-8)) / m
+		# Variante ohne neue Arrays: out dient als Zwischenspeicher
+		np.add(A, 1e-8, out=out)
+		np.log(out, out=out)
+		np.multiply(Y, out, out=out)
+		return -np.sum(out) / m
 
-	def backward(self, X, Y):
-		grads = {}
-		A = X
-		caches = {"A0": X}
+	def workspace(self, batch_size):
+		key = (tuple(self.layer_sizes), batch_size, self.dtype)
+		ws = self._workspaces.get(key)
+		if ws is None:
+			ws = Workspace(self.layer_sizes, batch_size, self.dtype)
+			self._workspaces[key] = ws
+		return ws
+
+	def forward_into(self, X, ws):
+		# Forwardpropagation direkt in die Puffer des Workspace, backward verwendet sie wieder
+		ws.A[0] = X
 		num_layers = len(self.parameters) // 2
+		profiler = self.profiler
 
-		# Forwardpropagation speichern
 		for i in range(1, num_layers + 1):
+			if profiler is not None:
+				profiler.begin()
 			W = self.parameters[f"W{i}"]
 			b = self.parameters[f"b{i}"]
-			Z = np.dot(W, A) + b
-			A = self.relu(Z) if i != num_layers else self.softmax(Z)
-			caches[f"Z{i}"] = Z
-			caches[f"A{i}"] = A
+			Z = ws.A[i]
+			if isinstance(ws.A[i - 1], SparseBatch):
+				# Nur über die im Batch aktiven Input-Features
+				ws.A[i - 1].dot(W, out=Z)
+			else:
+				np.dot(W, ws.A[i - 1], out=Z)
+			Z += b
+			if i != num_layers:
+				# ReLU in-place, Z wird direkt zur Aktivierung A
+				np.maximum(Z, 0, out=Z)
+			else:
+				# Softmax in-place mit numerischer Stabilisierung
+				np.max(Z, axis=0, keepdims=True, out=ws.column)
+				Z -= ws.column
+				np.exp(Z, out=Z)
+				np.sum(Z, axis=0, keepdims=True, out=ws.column)
+				ws.column += 1e-8
+				Z /= ws.column
+			if profiler is not None:
+				profiler.end("forward", i, 2 * W.size * Z.shape[1])
+
+		return ws.A[num_layers]
+
+	def backward(self, X, Y, ws=None, clip=True):
+		X = self.as_input(X)
+		Y = self.targets(Y)
+		num_layers = len(self.parameters) // 2
+		if ws is None:
+			ws = self.workspace(X.shape[1])
+			self.forward_into(X, ws)
 
 		# Initialisierung: Ableitung vom Loss bezüglich letztem Output
-		dZ = caches[f"A{num_layers}"] - Y  # Softmax + CrossEntropy zusammen
+		dZ = ws.dZ[num_layers]
+		if Y.ndim == 1:
+			# Mit Labels: an der Stelle der richtigen Klasse 1 abziehen, ohne One-Hot-Matrix
+			np.copyto(dZ, ws.A[num_layers])
+			dZ[Y, ws.columns] -= 1
+		else:
+			np.subtract(ws.A[num_layers], Y, out=dZ)  # Softmax + CrossEntropy zusammen
 
 		# Backpropagation rückwärts durch die Schichten
+		profiler = self.profiler
 		for i in reversed(range(1, num_layers + 1)):
-			A_prev = caches[f"A{i - 1}"]
+			if profiler is not None:
+				profiler.begin()
+			A_prev = ws.A[i - 1]
 			W = self.parameters[f"W{i}"]
 
 			# Ableitung dW mit Kettenregel
-			grads[f"dW{i}"] = np.dot(dZ, A_prev.T)  # Ableitung dL/dW
-			grads[f"db{i}"] = np.sum(dZ, axis=1,
-									 keepdims=True)  # Ableitung db, Summe der Fehler auf der gleichen Spalte
-			for key in grads:
-				grads[key] = np.clip(grads[key], -1.0, 1.0)
+			if isinstance(A_prev, SparseBatch):
+				A_prev.dot_transposed(dZ, out=self.grads[f"dW{i}"])
+			else:
+				np.dot(dZ, A_prev.T, out=self.grads[f"dW{i}"])  # Ableitung dL/dW
+			np.sum(dZ, axis=1, keepdims=True, out=self.grads[f"db{i}"])  # Ableitung db, Summe der Fehler auf der gleichen Spalte
 			if i > 1:
-				dA_prev = np.dot(W.T, dZ)
-				# ReLU Ableitung korrekt anwenden (nur da wo Z > 0)
-				dZ = dA_prev * (caches[f"Z{i - 1}"] > 0)
+				dZ = ws.dZ[i - 1]
+				np.dot(W.T, ws.dZ[i], out=dZ)
+				# ReLU Ableitung korrekt anwenden (nur da wo Z > 0, also auch A > 0)
+				np.greater(A_prev, 0, out=ws.masks[i - 1])
+				np.multiply(dZ, ws.masks[i - 1], out=dZ)
+			if profiler is not None:
+				# dW und (außer im ersten Layer) dA_prev sind je ein Matrixprodukt
+				profiler.end("backward", i, 2 * W.size * dZ.shape[1] * (2 if i > 1 else 1))
 
-		self.grads = grads
+		# Alle Gradienten auf einmal clippen (beim datenparallelen Training erst nach dem Summieren der Teil-Batches)
+		if clip:
+			np.clip(self.flat_grads, -1.0, 1.0, out=self.flat_grads)
 
 	def update_parameters(self, learning_rate=0.01):
+		if self.optimizer is not None:
+			self.optimizer.step(self.flat_parameters, self.flat_grads, learning_rate)
+			return
+		# Zu jedem Weight und Bias die in der Backpropagation berechneten Ableitungen mal einem Lernrate subtrahieren,
+		# dank des flachen Puffers in einer einzigen Operation
+		self.flat_parameters -= learning_rate * self.flat_grads
+
+	def train_step(self, X, Y, learning_rate=0.01, ws=None):
+		X = self.as_input(X)
+		Y = self.targets(Y)
+		if ws is None:
+			ws = self.workspace(X.shape[1])
 		num_layers = len(self.parameters) // 2
-		# Zu jedem Weight und Bias die in der Backpropagation berechneten Ableitungen mal einem Lernrate subtrahieren
-		for i in range(1, num_layers + 1):
-			self.parameters[f"W{i}"] -= learning_rate * self.grads[f"dW{i}"]
-			self.parameters[f"b{i}"] -= learning_rate * self.grads[f"db{i}"]
 
+		# Ein einziger Forward-Pass liefert Loss, Genauigkeit und die Aktivierungen für die Backpropagation
+		A = self.forward_into(X, ws)
+		loss = self.compute_loss(A, Y, out=ws.dZ[num_layers])  # dZ wird erst in backward überschrieben
+		np.argmax(A, axis=0, out=ws.predictions)
+		labels = Y if Y.ndim == 1 else np.argmax(Y, axis=0, out=ws.labels)
+		acc = np.count_nonzero(ws.predictions == labels) / X.shape[1]
+
+		self.backward(X, Y, ws)
+		self.update_parameters(learning_rate)
+		return loss, acc
+
+	def array_batches(self, X, Y, batch_size):
+		m = X.shape[1]
+		if batch_size >= m:
+			yield X, Y, self.workspace(m)
+			return
+
+		# Shuffle der Daten zu Beginn jedes Epochs, nur über eine Indexpermutation statt
+		# den ganzen Datensatz zu kopieren
+		perm = np.random.permutation(m)
+		for start in range(0, m, batch_size):
+			idx = perm[start:start + batch_size]
+			# Batch direkt in die vorallokierten Puffer des Workspace kopieren
+			ws = self.workspace(len(idx))
+			yield gather_columns(X, idx, ws.X), gather_columns(Y, idx, ws.Y if Y.ndim == 2 else ws.labels), ws
+
+	def loader_batches(self, loader):
+		# Batches aus einem Iterator (z.B. dataset.BatchLoader), der Speicher hängt nur von der Batchgröße ab
+		for X_batch, Y_batch in loader:
+			X_batch = self.as_input(X_batch)
+			Y_batch = self.targets(Y_batch)
+			yield X_batch, Y_batch, self.workspace(X_batch.shape[1])
+
+	def checkpoint_arrays(self, **extra):
+		# Momentaufnahme für einen Checkpoint: eigene Kopien von Parametern und Optimizer-Zustand,
+		# damit das Training weiterlaufen kann, während der Hintergrund-Thread schreibt
+		arrays = {"parameters": self.flat_parameters.copy(), "layer_sizes": np.array(self.layer_sizes),
+				  "dtype": np.array(self.dtype.str)}
+		if self.optimizer is not None:
+			arrays.update({key: np.array(value) for key, value in optimizer_to_arrays(self.optimizer).items()})
+		arrays.update({key: np.asarray(value) for key, value in extra.items()})
+		return arrays
+
+	def train(self, X, Y=None, epochs=100, learning_rate=0.01, print_loss=False, step_decay_parameter=1.68, batch_size=None,
+			  optimizer=None, schedule=None, callbacks=None, validation_data=None, validate_every=1, patience=None,
+			  restore_best=True, checkpoint=None, checkpoint_every=1):
+		# X, Y sind entweder die Matrix (784, m) und Labels (m,) bzw. One-Hot (10, m) oder X ist ein wiederholt iterierbarer
+		# Loader, der pro Epoche (X_batch, Y_batch) Paare liefert (dann bleibt Y None)
+		# validation_data = (X_val, labels): alle validate_every Epochen wird die Genauigkeit darauf (blockweise) gemessen.
+		# Nach patience Validierungen ohne Verbesserung wird abgebrochen, mit restore_best werden am Ende die Parameter
+		# der besten Validierung wiederhergestellt.
+		# checkpoint: Datei, in die alle checkpoint_every Epochen im Hintergrund gespeichert wird. Existiert sie schon,
+		# wird das Training dort fortgesetzt (epochs ist dann die Gesamtzahl der Epochen inklusive der schon trainierten).
+		if optimizer is not None:
+			self.optimizer = optimizer
+		if schedule is None:
+			# Standard ist der bisherige Step Decay
+			schedule = StepDecay(step_decay_parameter)
+		# Ohne Callbacks (und ohne print_loss) wird pro Schritt nichts zusätzlich gemessen
+		callbacks = list(callbacks) if callbacks else []
+		if print_loss:
+			callbacks.append(PrintProgress(every=5))
+
+		if Y is not None:
+			m = X.shape[1]
+			# Ohne batch_size wird wie bisher ein Full-Batch-Schritt pro Epoche gemacht
+			if batch_size is None or batch_size >= m:
+				batch_size = m
+				# Bei Full-Batch nur einmal in den dtype des Netzwerks umwandeln statt in jeder Epoche
+				X = X.astype(self.dtype, copy=False)
+			Y = self.targets(Y)
+
+		# Stand des Early Stopping; best_parameters wird bei jeder Verbesserung durch eine neue Kopie ersetzt
+		start_epoch = 0
+		best_accuracy, best_epoch, best_parameters = -1.0, -1, None
+		wait = 0
+		stopped = False
+		if checkpoint is not None and os.path.exists(checkpoint):
+			state = load_checkpoint(checkpoint)
+			if state["layer_sizes"].tolist() != list(self.layer_sizes):
+				raise ValueError(f"Checkpoint {checkpoint} hat layer_sizes {state['layer_sizes'].tolist()}, erwartet {list(self.layer_sizes)}.")
+			self.flat_parameters[...] = state["parameters"]
+			restored_optimizer = optimizer_from_arrays(state)
+			if restored_optimizer is not None:
+				self.optimizer = restored_optimizer
+			start_epoch = int(state["epochs_trained"])
+			best_accuracy, best_epoch = float(state["best_accuracy"]), int(state["best_epoch"])
+			best_parameters = state.get("best_parameters")
+			wait, stopped = int(state["wait"]), bool(state["stopped"])
+			self.epochs_trained = start_epoch
+		writer = CheckpointWriter(checkpoint) if checkpoint is not None else None
+
+		step = 0
+		try:
+			for epoch in range(start_epoch, epochs if not stopped else start_epoch):
+				epoch_learning_rate = schedule(epoch, learning_rate)
+				batches = self.array_batches(X, Y, batch_size) if Y is not None else self.loader_batches(X)
+				epoch_start = time.perf_counter()
+
+				epoch_loss = 0.0
+				correct = 0.0
+				samples = 0
+				for X_batch, Y_batch, ws in batches:
+					if callbacks:
+						step_start = time.perf_counter()
+					loss, acc = self.train_step(X_batch, Y_batch, epoch_learning_rate, ws)
+					epoch_loss += loss * X_batch.shape[1]
+					correct += acc * X_batch.shape[1]
+					samples += X_batch.shape[1]
+					step += 1
 
+					if callbacks:
+						logs = {"epoch": epoch, "loss": float(loss), "accuracy": float(acc), "learning_rate": float(epoch_learning_rate),
+								"samples_per_sec": X_batch.shape[1] / (time.perf_counter() - step_start)}
+						for callback in callbacks:
+							callback.on_step_end(step, logs)
+				self.epochs_trained = epoch + 1
 
-	def train(self, X, Y, epochs=100, learning_rate=0.01, print_loss=False, step_decay_parameter=1.68):
-		step_decay_learnrate = learning_rate
-		for epoch in range(epochs):
-			# Shuffle der Daten zu Beginn jedes Epochs
-			perm = np.random.permutation(X.shape[1])
-			X = X[:, perm]
-			Y = Y[:, perm]
+				val_accuracy = None
+				if validation_data is not None and ((epoch + 1) % validate_every == 0 or epoch == epochs - 1):
+					val_accuracy = float(self.evaluate(*validation_data)["accuracy"])
+					if val_accuracy > best_accuracy:
+						best_accuracy, best_epoch, best_parameters = val_accuracy, epoch, self.flat_parameters.copy()
+						wait = 0
+					else:
+						wait += 1
+						stopped = patience is not None and wait >= patience
 
-			A = self.forward(X)
-			loss = self.compute_loss(A, Y)
-			self.backward(X, Y)
-			self.update_parameters(step_decay_learnrate)
-			if print_loss and epoch % 5 == 0:
-				predictions = np.argmax(A, axis=0)
-				labels = np.argmax(Y, axis=0)
-				acc = np.mean(predictions == labels)
-				print(f"Epoch {epoch}: Loss = {loss:.4f}, Accuracy = {acc:.2%}")
-			if epoch % 10 == 0 and epoch != 0:
-				step_decay_learnrate /= step_decay_parameter
+				if callbacks:
+					logs = {"loss": float(epoch_loss / samples), "accuracy": float(correct / samples), "learning_rate": float(epoch_learning_rate),
+							"samples_per_sec": samples / (time.perf_counter() - epoch_start)}
+					if val_accuracy is not None:
+						logs["val_accuracy"] = val_accuracy
+					for callback in callbacks:
+						callback.on_epoch_end(epoch, logs)
 
+				if writer is not None and ((epoch + 1) % checkpoint_every == 0 or stopped or epoch == epochs - 1):
+					# Nur die Kopie entsteht hier, geschrieben wird im Hintergrund
+					extra = {"best_parameters": best_parameters} if best_parameters is not None else {}
+					writer.submit(self.checkpoint_arrays(epochs_trained=epoch + 1, best_accuracy=best_accuracy, best_epoch=best_epoch,
+														 wait=wait, stopped=stopped, **extra))
 
+				if stopped:
+					if print_loss:
+						print(f"Early Stopping nach Epoche {epoch}: beste Validierungsgenauigkeit {best_accuracy:.2%} in Epoche {best_epoch}")
+					break
+		finally:
+			if writer is not None:
+				writer.close()
 
+		if restore_best and best_parameters is not None:
+			self.flat_parameters[...] = best_parameters
+		self.best_epoch = best_epoch
+		self.best_val_accuracy = best_accuracy if best_epoch >= 0 else None
@@ -0,0 +1,208 @@
+import json
+
+import numpy as np
+
+
+# Alle Optimizer arbeiten direkt auf den flachen Puffern flat_parameters/flat_grads des Netzwerks.
+# Die Zustandspuffer (Momente) werden beim ersten Schritt einmal in der Größe von
+# parameter_count(layer_sizes) angelegt und danach nur noch in-place verändert.
+
+class SGD:
+	def __init__(self, momentum=0.0, nesterov=False, weight_decay=0.0):
+		if nesterov and momentum <= 0:
+			raise ValueError("Nesterov-Momentum benötigt momentum > 0.")
+		self.momentum = momentum
+		self.nesterov = nesterov
+		self.weight_decay = weight_decay
+		self.t = 0
+		self.velocity = None
+		self._buffer = None
+
+	def config(self):
+		return {"momentum": self.momentum, "nesterov": self.nesterov, "weight_decay": self.weight_decay}
+
+	def _allocate(self, params):
+		self._buffer = np.empty_like(params)
+		if self.momentum > 0 and self.velocity is None:
+			self.velocity = np.zeros_like(params)
+
+	def step(self, params, grads, learning_rate):
+		if self._buffer is None or self._buffer.shape != params.shape:
+			self._allocate(params)
+		self.t += 1
+		buf = self._buffer
+
+		if self.weight_decay:
+			# L2-Regularisierung direkt auf den Gradienten
+			np.multiply(params, self.weight_decay, out=buf)
+			grads += buf
+
+		if self.momentum > 0:
+			# v = momentum * v + g
+			self.velocity *= self.momentum
+			self.velocity += grads
+			if self.nesterov:
+				# Nesterov: Schritt mit g + momentum * v
+				np.multiply(self.velocity, self.momentum, out=buf)
+				buf += grads
+			else:
+				buf[...] = self.velocity
+			buf *= learning_rate
+		else:
+			np.multiply(grads, learning_rate, out=buf)
+
+		params -= buf
+
+	def state_dict(self):
+		state = {"t": np.array(self.t)}
+		if self.velocity is not None:
+			state["velocity"] = self.velocity
+		return state
+
+	def load_state_dict(self, state):
+		self.t = int(state["t"])
+		if "velocity" in state:
+			self.velocity = np.array(state["velocity"])
+
+
+class Adam:
+	def __init__(self, beta1=0.9, beta2=0.999, eps=1e-8, weight_decay=0.0):
+		self.beta1 = beta1
+		self.beta2 = beta2
+		self.eps = eps
+		self.weight_decay = weight_decay
+		self.t = 0
+		self.m = None
+		self.v = None
+		self._buffer = None
+
+	def config(self):
+		return {"beta1": self.beta1, "beta2": self.beta2, "eps": self.eps, "weight_decay": self.weight_decay}
+
+	def _allocate(self, params):
+		self._buffer = np.empty_like(params)
+		if self.m is None:
+			self.m = np.zeros_like(params)
+			self.v = np.zeros_like(params)
+
+	def _apply_weight_decay(self, params, grads, learning_rate):
+		# Adam: klassische L2-Regularisierung über den Gradienten
+		if self.weight_decay:
+			np.multiply(params, self.weight_decay, out=self._buffer)
+			grads += self._buffer
+
+	def step(self, params, grads, learning_rate):
+		if self._buffer is None or self._buffer.shape != params.shape:
+			self._allocate(params)
+		self.t += 1
+		buf = self._buffer
+		self._apply_weight_decay(params, grads, learning_rate)
+
+		# Erstes Moment: m = beta1 * m + (1 - beta1) * g
+		self.m *= self.beta1
+		np.multiply(grads, 1 - self.beta1, out=buf)
+		self.m += buf
+
+		# Zweites Moment: v = beta2 * v + (1 - beta2) * g^2
+		self.v *= self.beta2
+		np.square(grads, out=buf)
+		buf *= 1 - self.beta2
+		self.v += buf
+
+		# Bias-Korrektur und Schritt: params -= lr * m_hat / (sqrt(v_hat) + eps)
+		step_size = learning_rate / (1 - self.beta1 ** self.t)
+		np.sqrt(self.v, out=buf)
+		buf /= np.sqrt(1 - self.beta2 ** self.t)
+		buf += self.eps
+		np.divide(self.m, buf, out=buf)
+		buf *= step_size
+		params -= buf
+
+	def state_dict(self):
+		state = {"t": np.array(self.t)}
+		if self.m is not None:
+			state["m"] = self.m
+			state["v"] = self.v
+		return state
+
+	def load_state_dict(self, state):
+		self.t = int(state["t"])
+		if "m" in state:
+			self.m = np.array(state["m"])
+			self.v = np.array(state["v"])
+
+
+class AdamW(Adam):
+	def __init__(self, beta1=0.9, beta2=0.999, eps=1e-8, weight_decay=0.01):
+		super().__init__(beta1, beta2, eps, weight_decay)
+
+	def _apply_weight_decay(self, params, grads, learning_rate):
+		# AdamW: Weight Decay entkoppelt vom Gradienten direkt auf die Parameter anwenden
+		if self.weight_decay:
+			params *= 1 - learning_rate * self.weight_decay
+
+
+OPTIMIZERS = {cls.__name__: cls for cls in (SGD, Adam, AdamW)}
+
+
+def optimizer_to_arrays(optimizer, prefix="optimizer_"):
+	# Zustand als reine numpy Arrays, damit er ohne Pickle in der .npz Datei landen kann
+	arrays = {
+		f"{prefix}type": np.array(type(optimizer).__name__),
+		f"{prefix}config": np.array(json.dumps(optimizer.config())),
+	}
+	for key, value in optimizer.state_dict().items():
+		arrays[f"{prefix}{key}"] = value
+	return arrays
+
+
+def optimizer_from_arrays(data, prefix="optimizer_"):
+	if f"{prefix}type" not in data:
+		return None
+	name = str(data[f"{prefix}type"])
+	if name not in OPTIMIZERS:
+		raise ValueError(f"Unbekannter Optimizer '{name}' in der Datei.")
+	optimizer = OPTIMIZERS[name](**json.loads(str(data[f"{prefix}config"])))
+	state = {key[len(prefix):]: data[key] for key in data
+			 if key.startswith(prefix) and key not in (f"{prefix}type", f"{prefix}config")}
+	optimizer.load_state_dict(state)
+	return optimizer
+
+
+# Lernraten-Schedules: schedule(epoch, learning_rate) liefert die Lernrate für die angegebene Epoche
+
+class ConstantLR:
+	def __call__(self, epoch, learning_rate):
+		return learning_rate
+
+
+class StepDecay:
+	# Entspricht dem bisherigen Verhalten von train: nach jeder 10. Epoche wird die Lernrate durch factor geteilt
+	def __init__(self, factor=1.68, every=10):
+		self.factor = factor
+		self.every = every
+
+	def __call__(self, epoch, learning_rate):
+		return learning_rate / self.factor ** max(0, (epoch - 1) // self.every)
+
+
+class CosineDecay:
+	def __init__(self, total_epochs, min_learning_rate=0.0):
+		self.total_epochs = total_epochs
+		self.min_learning_rate = min_learning_rate
+
+	def __call__(self, epoch, learning_rate):
+		progress = min(epoch, self.total_epochs) / max(1, self.total_epochs)
+		return self.min_learning_rate + 0.5 * (learning_rate - self.min_learning_rate) * (1 + np.cos(np.pi * progress))
+
+
+class Warmup:
+	# Lineares Aufwärmen über warmup_epochs, danach übernimmt der Schedule after (mit verschobener Epoche)
+	def __init__(self, warmup_epochs, after=None):
+		self.warmup_epochs = warmup_epochs
+		self.after = after if after is not None else ConstantLR()
+
+	def __call__(self, epoch, learning_rate):
+		if epoch < self.warmup_epochs:
+			return learning_rate * (epoch + 1) / self.warmup_epochs
+		return self.after(epoch - self.warmup_epochs, learning_rate)
@@ -0,0 +1,235 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from neural_network import NeuralNetwork, gather_columns, parameter_count
+from optimizers import StepDecay
+from sweep import blas_threads
+
+
+# Datenparalleles Training: jeder Worker-Prozess rechnet backward für seinen Teil des Batches.
+# Parameter, Gradienten und Batch liegen in Shared Memory, es wird also nichts zwischen den
+# Prozessen kopiert. Die Gradienten sind im Netzwerk Summen über die Spalten des Batches, deshalb
+# ergibt die Summe der Teil-Gradienten genau den Gradienten des ganzen Batches; geclippt wird
+# erst danach, wie beim Training in einem Prozess.
+
+def _shared_array(shape, dtype):
+	dtype = np.dtype(dtype)
+	shm = SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+	return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _attach(name, shape, dtype):
+	shm = SharedMemory(name=name)
+	return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_main(rank, conn, layer_sizes, dtype, max_batch_size, names):
+	P = parameter_count(layer_sizes)
+	n_in = layer_sizes[0]
+	shm_params, params = _attach(names["params"], (P,), dtype)
+	shm_grads, grads = _attach(names["grads"], (names["workers"], P), dtype)
+	shm_x, x_flat = _attach(names["x"], (n_in * max_batch_size,), dtype)
+	shm_y, labels = _attach(names["y"], (max_batch_size,), np.intp)
+
+	# Das Netzwerk im Worker arbeitet direkt auf den gemeinsamen Parametern und schreibt
+	# seine Gradienten in die eigene Zeile des Gradientenpuffers
+	model = NeuralNetwork.from_buffer(layer_sizes, params)
+	model.set_grad_buffer(grads[rank])
+
+	try:
+		while True:
+			command = conn.recv()
+			if command[0] == "stop":
+				break
+			_, lo, hi = command
+			m = hi - lo
+			if m == 0:
+				grads[rank] = 0
+				conn.send((0.0, 0))
+				continue
+
+			# Teil-Batch liegt zusammenhängend als (784, m) Block im Shared Memory
+			X = x_flat[n_in * lo:n_in * hi].reshape(n_in, m)
+			y = labels[lo:hi]
+			ws = model.workspace(m)
+			A = model.forward_into(X, ws)
+			loss = model.compute_loss(A, y) * m
+			correct = np.count_nonzero(np.argmax(A, axis=0) == y)
+			model.backward(X, y, ws, clip=False)
+			conn.send((float(loss), int(correct)))
+	finally:
+		# Views auf die Puffer freigeben, bevor der Shared Memory geschlossen wird
+		del model, params, grads, x_flat, labels
+		for shm in (shm_params, shm_grads, shm_x, shm_y):
+			shm.close()
+
+
+class DataParallelTrainer:
+	def __init__(self, model, workers=2, max_batch_size=1024, threads_per_worker=1):
+		self.model = model
+		self.workers = workers
+		self.max_batch_size = max_batch_size
+		layer_sizes = list(model.layer_sizes)
+		P = parameter_count(layer_sizes)
+
+		self._shm = {}
+		self._shm["params"], params = _shared_array((P,), model.dtype)
+		self._shm["grads"], self.grad_slots = _shared_array((workers, P), model.dtype)
+		self._shm["x"], self.x_flat = _shared_array((layer_sizes[0] * max_batch_size,), model.dtype)
+		self._shm["y"], self.labels = _shared_array((max_batch_size,), np.intp)
+
+		# Das Modell wird auf die gemeinsamen Parameter umgestellt, Updates des Optimizers
+		# sind damit sofort für alle Worker sichtbar
+		params[...] = model.flat_parameters
+		model.set_parameter_buffer(params)
+
+		names = {key: shm.name for key, shm in self._shm.items()}
+		names["workers"] = workers
+
+		ctx = mp.get_context("spawn")
+		self._conns = []
+		self._processes = []
+		with blas_threads(threads_per_worker):
+			for rank in range(workers):
+				parent_conn, child_conn = ctx.Pipe()
+				process = ctx.Process(target=_worker_main, daemon=True,
+									  args=(rank, child_conn, layer_sizes, model.dtype.str, max_batch_size, names))
+				process.start()
+				self._conns.append(parent_conn)
+				self._processes.append(process)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		if not self._processes:
+			return
+		for conn in self._conns:
+			conn.send(("stop",))
+		for process in self._processes:
+			process.join()
+		self._processes = []
+
+		# Das Modell bekommt wieder eigene Puffer, danach kann der Shared Memory freigegeben werden
+		self.model.set_parameter_buffer(self.model.flat_parameters.copy())
+		self.grad_slots = self.x_flat = self.labels = None
+		for shm in self._shm.values():
+			shm.close()
+			shm.unlink()
+
+	def shard_bounds(self, m):
+		bounds = np.linspace(0, m, self.workers + 1).astype(int)
+		return list(zip(bounds[:-1], bounds[1:]))
+
+	def step(self, X, y, learning_rate=0.01, idx=None):
+		# X (784, n) mit Labels y; mit idx werden nur diese Spalten als Batch verwendet
+		m = len(idx) if idx is not None else X.shape[1]
+		if m > self.max_batch_size:
+			raise ValueError(f"Batchgröße {m} ist größer als max_batch_size {self.max_batch_size}.")
+		n_in = self.model.layer_sizes[0]
+		bounds = self.shard_bounds(m)
+
+		# Jeder Teil-Batch wird zusammenhängend in den Shared Memory geschrieben
+		for lo, hi in bounds:
+			shard = self.x_flat[n_in * lo:n_in * hi].reshape(n_in, hi - lo)
+			if idx is not None:
+				gather_columns(X, idx[lo:hi], shard)
+				gather_columns(y, idx[lo:hi], self.labels[lo:hi])
+			else:
+				shard[...] = X[:, lo:hi]
+				self.labels[lo:hi] = y[lo:hi]
+
+		for conn, (lo, hi) in zip(self._conns, bounds):
+			conn.send(("step", lo, hi))
+		loss = 0.0
+		correct = 0
+		for conn in self._conns:
+			worker_loss, worker_correct = conn.recv()
+			loss += worker_loss
+			correct += worker_correct
+
+		# Teil-Gradienten in fester Reihenfolge summieren, dann wie gewohnt clippen und updaten
+		np.sum(self.grad_slots, axis=0, out=self.model.flat_grads)
+		np.clip(self.model.flat_grads, -1.0, 1.0, out=self.model.flat_grads)
+		self.model.update_parameters(learning_rate)
+		return loss / m, correct / m
+
+	def train(self, X, y, epochs=100, learning_rate=0.01, print_loss=False, step_decay_parameter=1.68,
+			  batch_size=None, optimizer=None, schedule=None):
+		if optimizer is not None:
+			self.model.optimizer = optimizer
+		if schedule is None:
+			schedule = StepDecay(step_decay_parameter)
+		y = np.asarray(y)
+		if y.ndim == 2:
+			y = np.argmax(y, axis=0)
+		m = X.shape[1]
+		batch_size = min(batch_size or m, m, self.max_batch_size)
+
+		for epoch in range(epochs):
+			epoch_learning_rate = schedule(epoch, learning_rate)
+			perm = np.random.permutation(m)
+			epoch_loss = 0.0
+			correct = 0.0
+			for start in range(0, m, batch_size):
+				idx = perm[start:start + batch_size]
+				loss, acc = self.step(X, y, epoch_learning_rate, idx)
+				epoch_loss += loss * len(idx)
+				correct += acc * len(idx)
+			if print_loss and epoch % 5 == 0:
+				print(f"Epoch {epoch}: Loss = {epoch_loss / m:.4f}, Accuracy = {correct / m:.2%}")
+
+
+def benchmark(layer_sizes, batch_size, worker_counts, steps, dtype):
+	# Skalierung über verschiedene Worker-Zahlen auf synthetischen Daten; zusätzlich wird
+	# der Gradient mit dem eines einzelnen Prozesses verglichen
+	rng = np.random.default_rng(0)
+	X = rng.random((layer_sizes[0], batch_size)).astype(dtype)
+	y = rng.integers(0, layer_sizes[-1], batch_size)
+
+	np.random.seed(0)
+	reference = NeuralNetwork(layer_sizes, dtype=dtype)
+	initial = reference.flat_parameters.copy()
+	reference.backward(X, y)
+	reference_grads = reference.flat_grads.copy()
+	start = time.perf_counter()
+	for _ in range(steps):
+		reference.train_step(X, y, 0.0)
+	single_time = (time.perf_counter() - start) / steps
+	print(f"1 Prozess (ohne Shared Memory): {1000 * single_time:.2f} ms/Schritt")
+
+	for workers in worker_counts:
+		model = NeuralNetwork(layer_sizes, dtype=dtype)
+		model.flat_parameters[...] = initial
+		with DataParallelTrainer(model, workers=workers, max_batch_size=batch_size) as trainer:
+			# Lernrate 0: Parameter bleiben gleich, der Gradient ist direkt vergleichbar
+			trainer.step(X, y, 0.0)
+			difference = np.max(np.abs(model.flat_grads - reference_grads))
+			start = time.perf_counter()
+			for _ in range(steps):
+				trainer.step(X, y, 0.0)
+			step_time = (time.perf_counter() - start) / steps
+		print(f"{workers} Worker: {1000 * step_time:.2f} ms/Schritt, Speedup {single_time / step_time:.2f}x, "
+			  f"max. Abweichung Gradient {difference:.2e}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Skalierungs-Benchmark für datenparalleles Training")
+	parser.add_argument("--layer-sizes", type=int, nargs="+", default=[784, 256, 128, 10])
+	parser.add_argument("--batch-size", type=int, default=4096)
+	parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+	parser.add_argument("--steps", type=int, default=20)
+	parser.add_argument("--dtype", default="float32")
+	args = parser.parse_args()
+	benchmark(args.layer_sizes, args.batch_size, args.workers, args.steps, np.dtype(args.dtype))
+
+
+if __name__ == "__main__":
+	main()
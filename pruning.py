@@ -0,0 +1,111 @@
+import argparse
+import os
+
+import numpy as np
+
+from neural_network import NeuralNetwork, layer_views, parameter_count
+
+# Strukturiertes Pruning: unwichtige Neuronen der versteckten Layer werden entfernt, d.h. die Zeilen von W{i}/b{i}
+# und die zugehörigen Spalten von W{i+1}. Das Ergebnis ist wieder ein normales, kleineres dense Netzwerk
+# (weniger Parameter, schnellere Inferenz, kleinere Datei) und braucht keine Unterstützung für sparse Gewichte.
+
+METHODS = ("weight_norm", "activation")
+
+
+def neuron_importance(model, method="weight_norm", X=None):
+	# Wichtigkeit jedes Neurons der versteckten Layer 1 .. L-1, jeweils mal der Norm der ausgehenden Gewichte:
+	#   weight_norm: Norm der eingehenden Gewichte (ohne Daten)
+	#   activation:  mittlere Aktivierung auf dem Kalibrierungs-Batch X (784, m)
+	num_layers = len(model.layer_sizes) - 1
+	if method == "activation":
+		if X is None:
+			raise ValueError("Für method='activation' wird ein Kalibrierungs-Batch X benötigt.")
+		X = np.asarray(X, dtype=model.dtype)
+		ws = model.workspace(X.shape[1])
+		model.forward_into(X, ws)
+	elif method != "weight_norm":
+		raise ValueError(f"Unbekannte Methode {method!r}, erlaubt sind {METHODS}.")
+
+	importance = []
+	for i in range(1, num_layers):
+		outgoing = np.linalg.norm(model.parameters[f"W{i + 1}"], axis=0)
+		if method == "weight_norm":
+			incoming = np.linalg.norm(model.parameters[f"W{i}"], axis=1)
+		else:
+			incoming = ws.A[i].mean(axis=1)
+		importance.append(incoming * outgoing)
+	return importance
+
+
+def prune(model, keep=0.5, method="weight_norm", X=None):
+	# keep ist entweder ein Anteil (für alle versteckten Layer gleich) oder eine Liste mit der neuen Größe jedes Layers
+	hidden_sizes = model.layer_sizes[1:-1]
+	if np.isscalar(keep):
+		new_hidden = [max(1, int(round(keep * n))) for n in hidden_sizes]
+	else:
+		new_hidden = [int(n) for n in keep]
+	if len(new_hidden) != len(hidden_sizes) or not all(1 <= new <= old for new, old in zip(new_hidden, hidden_sizes)):
+		raise ValueError(f"Ungültige neue Layergrößen {new_hidden} für die versteckten Layer {hidden_sizes}.")
+
+	# Indizes der behaltenen Neuronen pro Layer, Input und Output bleiben vollständig
+	importance = neuron_importance(model, method, X)
+	kept = [np.arange(model.layer_sizes[0])]
+	for scores, n in zip(importance, new_hidden):
+		kept.append(np.sort(np.argsort(-scores, kind="stable")[:n]))
+	kept.append(np.arange(model.layer_sizes[-1]))
+
+	layer_sizes = [model.layer_sizes[0]] + new_hidden + [model.layer_sizes[-1]]
+	flat = np.empty(parameter_count(layer_sizes), dtype=model.dtype)
+	views = layer_views(layer_sizes, flat)
+	for i in range(1, len(layer_sizes)):
+		views[f"W{i}"][...] = model.parameters[f"W{i}"][np.ix_(kept[i], kept[i - 1])]
+		views[f"b{i}"][...] = model.parameters[f"b{i}"][kept[i]]
+	return NeuralNetwork.from_buffer(layer_sizes, flat)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Unwichtige Neuronen entfernen und das Netzwerk verkleinern")
+	parser.add_argument("model", help="Trainiertes Modell (.npz oder .nnm)")
+	parser.add_argument("--keep", type=float, default=0.5, help="Anteil der behaltenen Neuronen pro verstecktem Layer")
+	parser.add_argument("--method", choices=METHODS, default="weight_norm")
+	parser.add_argument("--data", default="mnist.npz", help="MNIST-Datei für Kalibrierung, Fine-Tuning und Test")
+	parser.add_argument("--calibration-samples", type=int, default=1000)
+	parser.add_argument("--fine-tune-epochs", type=int, default=0)
+	parser.add_argument("--learning-rate", type=float, default=0.01)
+	parser.add_argument("--batch-size", type=int, default=128)
+	parser.add_argument("--train-samples", type=int, default=60000)
+	parser.add_argument("--output", help="Zieldatei (Standard: <model>_pruned.npz)")
+	args = parser.parse_args()
+
+	from dataset import BatchLoader, MNISTDataset
+	from optimizers import ConstantLR
+
+	model = NeuralNetwork.from_file(args.model, mmap=False)
+	train_set = MNISTDataset.from_npz(args.data, "train").subset(args.train_samples)
+	test_set = MNISTDataset.from_npz(args.data, "test")
+	X_test = test_set.to_matrix(model.dtype)
+	labels = np.asarray(test_set.labels)
+
+	X_calibration = train_set.subset(args.calibration_samples).to_matrix(model.dtype)
+	pruned = prune(model, args.keep, args.method, X_calibration)
+
+	original_params = model.weights_counter + model.bias_counter
+	pruned_params = pruned.weights_counter + pruned.bias_counter
+	print(f"Architektur: {model.layer_sizes} -> {pruned.layer_sizes}")
+	print(f"Parameter:   {original_params} -> {pruned_params} ({pruned_params / original_params:.1%})")
+	print(f"Genauigkeit original:       {model.evaluate(X_test, labels)['accuracy']:.4f}")
+	print(f"Genauigkeit gepruned:       {pruned.evaluate(X_test, labels)['accuracy']:.4f}")
+
+	if args.fine_tune_epochs > 0:
+		# Kurzes Nachtrainieren mit konstanter Lernrate, damit sich die übrigen Neuronen anpassen
+		loader = BatchLoader(train_set, batch_size=args.batch_size, dtype=model.dtype)
+		pruned.train(loader, epochs=args.fine_tune_epochs, learning_rate=args.learning_rate, schedule=ConstantLR())
+		print(f"Genauigkeit nach Fine-Tuning: {pruned.evaluate(X_test, labels)['accuracy']:.4f}")
+
+	output = args.output or os.path.splitext(args.model)[0] + "_pruned.npz"
+	pruned.save(output)
+	print(f"Datei: {os.path.getsize(args.model) / 1024:.1f} KB -> {os.path.getsize(output) / 1024:.1f} KB ({output})")
+
+
+if __name__ == "__main__":
+	main()
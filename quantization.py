@@ -0,0 +1,116 @@
+import argparse
+import os
+
+import numpy as np
+
+from neural_network import Classifier, NeuralNetwork
+
+# Post-Training-Quantisierung: jede Zeile von W{i} wird mit einem eigenen Skalierungsfaktor auf int8
+# abgebildet (W ≈ W_q * scale), die Biases bleiben float32. Das Modell ist damit 8x kleiner als in float64.
+
+QUANTIZED_EXTENSION = ".q8.npz"
+
+
+def quantize_rows(W):
+	# Symmetrische Quantisierung pro Zeile: der betragsgrößte Wert der Zeile wird auf 127 abgebildet
+	scale = np.max(np.abs(W), axis=1, keepdims=True) / 127
+	scale[scale == 0] = 1
+	W_q = np.clip(np.rint(W / scale), -127, 127).astype(np.int8)
+	return W_q, scale.astype(np.float32)
+
+
+class QuantizedNetwork(Classifier):
+	def __init__(self, layer_sizes, weights, scales, biases):
+		self.layer_sizes = list(layer_sizes)
+		self.dtype = np.dtype(np.float32)
+		self.weights = weights
+		self.scales = scales
+		self.biases = biases
+
+	@classmethod
+	def from_network(cls, model):
+		weights, scales, biases = [], [], []
+		for i in range(1, len(model.layer_sizes)):
+			W_q, scale = quantize_rows(model.parameters[f"W{i}"])
+			weights.append(W_q)
+			scales.append(scale)
+			biases.append(model.parameters[f"b{i}"].astype(np.float32))
+		return cls(model.layer_sizes, weights, scales, biases)
+
+	def forward(self, X):
+		X = np.asarray(X, dtype=np.float32)
+		if X.ndim == 1:
+			X = X.reshape(-1, 1)
+		if X.shape[0] != self.layer_sizes[0]:
+			raise ValueError(
+				f"Falsche Input-Größe: erwartet {self.layer_sizes[0]} Eingänge, aber erhalten {X.shape[0]}.")
+
+		A = X
+		num_layers = len(self.weights)
+		for i in range(num_layers):
+			# (W_q @ A) * scale entspricht W @ A, weil die Skalierung pro Ausgabezeile konstant ist
+			Z = np.dot(self.weights[i], A)
+			Z *= self.scales[i]
+			Z += self.biases[i]
+			A = np.maximum(Z, 0, out=Z) if i != num_layers - 1 else NeuralNetwork.softmax(Z)
+		return A
+
+	def save(self, filename):
+		if not filename.endswith(QUANTIZED_EXTENSION):
+			filename += QUANTIZED_EXTENSION
+		arrays = {}
+		for i in range(len(self.weights)):
+			arrays[f"Wq{i + 1}"] = self.weights[i]
+			arrays[f"scale{i + 1}"] = self.scales[i]
+			arrays[f"b{i + 1}"] = self.biases[i]
+		np.savez(filename, **arrays, layer_sizes=np.array(self.layer_sizes))
+
+	@classmethod
+	def load(cls, filename):
+		with np.load(filename, allow_pickle=False) as data:
+			if "layer_sizes" not in data or "Wq1" not in data:
+				raise ValueError(f"{filename} ist kein quantisiertes Modell.")
+			layer_sizes = data["layer_sizes"].tolist()
+			weights, scales, biases = [], [], []
+			for i in range(1, len(layer_sizes)):
+				shape = (layer_sizes[i], layer_sizes[i - 1])
+				if data[f"Wq{i}"].shape != shape or data[f"Wq{i}"].dtype != np.int8:
+					raise ValueError(f"{filename}: Wq{i} hat nicht die Form {shape} bzw. den Typ int8.")
+				weights.append(data[f"Wq{i}"])
+				scales.append(data[f"scale{i}"].astype(np.float32).reshape(-1, 1))
+				biases.append(data[f"b{i}"].astype(np.float32).reshape(-1, 1))
+		return cls(layer_sizes, weights, scales, biases)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="int8 Post-Training-Quantisierung mit Genauigkeitsvergleich")
+	parser.add_argument("model", help="Trainiertes Modell (.npz oder .nnm)")
+	parser.add_argument("--output", help=f"Zieldatei (Standard: <model>{QUANTIZED_EXTENSION})")
+	parser.add_argument("--data", default="mnist.npz", help="MNIST-Datei für den Vergleich auf dem Testset")
+	args = parser.parse_args()
+
+	model = NeuralNetwork.from_file(args.model)
+	quantized = QuantizedNetwork.from_network(model)
+	output = args.output or os.path.splitext(args.model)[0] + QUANTIZED_EXTENSION
+	quantized.save(output)
+	print(f"Modell: {os.path.getsize(args.model) / 1024:.1f} KB -> quantisiert: {os.path.getsize(output) / 1024:.1f} KB ({output})")
+
+	if not os.path.exists(args.data):
+		print(f"{args.data} nicht gefunden, Genauigkeitsvergleich übersprungen.")
+		return
+	from dataset import MNISTDataset
+	test_set = MNISTDataset.from_npz(args.data, "test")
+	X_test = test_set.to_matrix(np.float32)
+	labels = np.asarray(test_set.labels)
+
+	original = model.evaluate(X_test, labels)
+	result = quantized.evaluate(X_test, labels)
+	agreement = np.mean(original["predictions"] == result["predictions"])
+	print(f"Genauigkeit original:    {original['accuracy']:.4f}")
+	print(f"Genauigkeit int8:        {result['accuracy']:.4f}")
+	print(f"Differenz:               {result['accuracy'] - original['accuracy']:+.4f}")
+	print(f"Gleiche Vorhersagen:     {agreement:.2%}")
+
+
+if __name__ == "__main__":
+	main()
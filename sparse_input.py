@@ -0,0 +1,68 @@
+import numpy as np
+
+# MNIST-Bilder und die GUI-Zeichenfläche sind größtenteils null, und in einem Batch sind viele Pixel (z.B. die Ränder)
+# in keinem einzigen Sample gesetzt. Ein SparseBatch speichert nur die aktiven Features (Zeilen, die in mindestens
+# einem Sample ungleich null sind) als kompakte Matrix, der erste Layer rechnet dann nur über diese:
+# W1 @ X = W1[:, active] @ X_active und dW1[:, active] = dZ1 @ X_active.T (alle anderen Spalten von dW1 sind 0).
+# Über MAX_ACTIVE_FRACTION hinaus lohnt sich das nicht mehr (Kopieren von W1[:, active] und das Verteilen in dW1
+# kosten mehr als die eingesparten Multiplikationen, siehe benchmark.py), dann wird der normale dense Input verwendet.
+
+MAX_ACTIVE_FRACTION = 0.5
+
+
+class SparseBatch:
+	def __init__(self, active, values, num_features):
+		# active: sortierte Indizes der aktiven Features, values: (len(active), m) Werte dieser Features
+		self.active = np.asarray(active, dtype=np.intp)
+		self.values = values
+		self.num_features = num_features
+		if self.values.shape[0] != len(self.active):
+			raise ValueError(f"Anzahl aktiver Features ({len(self.active)}) passt nicht zu values {self.values.shape}.")
+
+	@classmethod
+	def from_dense(cls, X):
+		X = np.asarray(X)
+		active = np.flatnonzero(X.any(axis=1))
+		return cls(active, X[active], X.shape[0])
+
+	@property
+	def shape(self):
+		return (self.num_features, self.values.shape[1])
+
+	@property
+	def dtype(self):
+		return self.values.dtype
+
+	@property
+	def active_fraction(self):
+		return len(self.active) / self.num_features
+
+	def columns(self, start, stop):
+		# Samples start .. stop-1 als SparseBatch mit denselben aktiven Features (entspricht X[:, start:stop])
+		return SparseBatch(self.active, self.values[:, start:stop], self.num_features)
+
+	def to_dense(self):
+		X = np.zeros(self.shape, dtype=self.values.dtype)
+		X[self.active] = self.values
+		return X
+
+	def dot(self, W, out=None):
+		# W @ X, nur über die aktiven Spalten von W
+		return np.dot(W[:, self.active], self.values, out=out)
+
+	def dot_transposed(self, dZ, out=None):
+		# dZ @ X.T, die Spalten der inaktiven Features bleiben 0
+		if out is None:
+			out = np.empty((dZ.shape[0], self.num_features), dtype=np.result_type(dZ, self.values))
+		out.fill(0)
+		out[:, self.active] = np.dot(dZ, self.values.T)
+		return out
+
+
+def maybe_sparse(X, max_active_fraction=MAX_ACTIVE_FRACTION):
+	# SparseBatch, falls höchstens max_active_fraction der Features aktiv sind, sonst X unverändert
+	X = np.asarray(X)
+	active = np.flatnonzero(X.any(axis=1))
+	if len(active) > max_active_fraction * X.shape[0]:
+		return X
+	return SparseBatch(active, X[active], X.shape[0])
@@ -0,0 +1,216 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+
+# Diese Variablen werden von den BLAS-Bibliotheken nur beim Import von numpy gelesen,
+# deshalb müssen sie gesetzt sein, bevor die Worker-Prozesse starten
+BLAS_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+						 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# Entspricht den früher auskommentierten Schleifen in MNIST_training.py
+DEFAULT_GRID = {
+	"layer_sizes": [[784, 32, 10], [784, 64, 10], [784, 128, 10], [784, 32, 32, 10], [784, 64, 32, 10], [784, 32, 32, 32, 10]],
+	"learning_rate": [0.01],
+	"epochs": [10],
+	"train_samples": [60000],
+	"batch_size": [128],
+	"step_decay_parameter": [1.68],
+	"optimizer": [None],
+	"seed": [0],
+}
+
+
+@contextmanager
+def blas_threads(threads):
+	# Setzt die BLAS-Variablen für neu gestartete Prozesse und stellt danach die vorherigen Werte wieder her
+	previous_env = {key: os.environ.get(key) for key in BLAS_THREAD_VARIABLES}
+	os.environ.update({key: str(threads) for key in BLAS_THREAD_VARIABLES})
+	try:
+		yield
+	finally:
+		for key, value in previous_env.items():
+			if value is None:
+				os.environ.pop(key, None)
+			else:
+				os.environ[key] = value
+
+
+def expand_grid(grid):
+	# {"a": [1, 2], "b": [3]} -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+	keys = list(grid)
+	return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def config_key(config):
+	return json.dumps(config, sort_keys=True)
+
+
+def config_hash(config):
+	# Kurzer, stabiler Hash über alle Einträge der Konfiguration
+	return hashlib.sha1(config_key(config).encode()).hexdigest()[:10]
+
+
+def model_filename(config):
+	# Lesbarer Präfix plus Hash, damit sich Konfigurationen, die sich nur z.B. im seed oder
+	# step_decay_parameter unterscheiden, nicht gegenseitig überschreiben
+	return (f"network_{'_'.join(map(str, config['layer_sizes']))}_ep{config['epochs']}"
+			f"_lr{config['learning_rate']:.4f}_bs{config['batch_size']}_{config.get('optimizer') or 'SGD'}"
+			f"_{config_hash(config)}.npz")
+
+
+def load_finished(results_path):
+	# Bereits abgeschlossene Konfigurationen, damit ein unterbrochener Sweep fortgesetzt werden kann.
+	# Eine unvollständige letzte Zeile (z.B. nach einem Absturz) wird ignoriert.
+	finished = set()
+	if not os.path.exists(results_path):
+		return finished
+	with open(results_path) as f:
+		for line in f:
+			try:
+				finished.add(config_key(json.loads(line)["config"]))
+			except (json.JSONDecodeError, KeyError):
+				continue
+	return finished
+
+
+def append_result(results_path, result):
+	# Nur der Hauptprozess schreibt, eine Zeile pro Ergebnis, sofort auf die Platte
+	with open(results_path, "a") as f:
+		f.write(json.dumps(result) + "\n")
+		f.flush()
+		os.fsync(f.fileno())
+
+
+def _init_worker(threads):
+	# Falls threadpoolctl installiert ist, die BLAS-Threads zusätzlich zur Laufzeit begrenzen
+	try:
+		from threadpoolctl import threadpool_limits
+	except ImportError:
+		return
+	threadpool_limits(threads)
+
+
+def run_config(config, data_file="mnist.npz", model_dir=".", dtype="float32"):
+	from dataset import BatchLoader, MNISTDataset
+	from neural_network import NeuralNetwork
+	from optimizers import OPTIMIZERS
+
+	start = time.perf_counter()
+	np.random.seed(config.get("seed", 0))
+
+	# Alle Worker öffnen dieselben .npy Dateien als Memory-Map, die Daten liegen also
+	# nur einmal (read-only) im Page Cache statt einmal pro Prozess
+	train_set = MNISTDataset.from_npz(data_file, "train")
+	test_set = MNISTDataset.from_npz(data_file, "test")
+	# Optional Early Stopping auf einem Validierungsset aus den letzten Trainingsbildern
+	validation_data = None
+	if config.get("patience") is not None:
+		train_set, validation_set = train_set.split(config.get("validation_samples", 5000))
+		validation_data = (validation_set.to_matrix(dtype), validation_set.labels)
+	train_set = train_set.subset(config["train_samples"])
+
+	model = NeuralNetwork(config["layer_sizes"], dtype=dtype)
+	optimizer = OPTIMIZERS[config["optimizer"]]() if config.get("optimizer") else None
+	loader = BatchLoader(train_set, batch_size=config["batch_size"], dtype=dtype, seed=config.get("seed", 0))
+
+	filename = model_filename(config)
+	# Ein abgebrochener Sweep setzt unfertige Konfigurationen beim nächsten Start am letzten Checkpoint fort.
+	# Der Name passt bewusst nicht auf network_*.npz, damit z.B. ensemble.py keine Checkpoints als Modelle lädt.
+	checkpoint = os.path.join(model_dir, f"ckpt_{config_hash(config)}.npz")
+	resumed_epochs = 0
+	if os.path.exists(checkpoint):
+		with np.load(checkpoint) as data:
+			resumed_epochs = int(data["epochs_trained"])
+
+	train_start = time.perf_counter()
+	model.train(loader, epochs=config["epochs"], learning_rate=config["learning_rate"],
+				step_decay_parameter=config["step_decay_parameter"], optimizer=optimizer,
+				validation_data=validation_data, patience=config.get("patience"), checkpoint=checkpoint)
+	train_time = time.perf_counter() - train_start
+
+	results = model.evaluate(test_set.to_matrix(dtype), test_set.labels)
+	params = model.weights_counter + model.bias_counter
+
+	model.save(os.path.join(model_dir, filename))
+	if os.path.exists(checkpoint):
+		os.remove(checkpoint)
+
+	return {
+		"config": config,
+		"accuracy": float(results["accuracy"]),
+		"per_class_accuracy": np.round(results["per_class_accuracy"], 4).tolist(),
+		"parameters": params,
+		"efficiency": float(results["accuracy"]) / params,
+		"train_time": train_time,
+		"wall_time": time.perf_counter() - start,
+		"epochs_trained": model.epochs_trained,
+		"best_epoch": model.best_epoch,
+		"samples_per_sec": (model.epochs_trained - resumed_epochs) * len(train_set) / train_time,
+		"model_file": filename,
+		"pid": os.getpid(),
+	}
+
+
+def run_sweep(configs, results_path="sweep_results.jsonl", workers=None, threads_per_worker=1,
+			  data_file="mnist.npz", model_dir=".", dtype="float32"):
+	finished = load_finished(results_path)
+	pending = [config for config in configs if config_key(config) not in finished]
+	print(f"{len(configs) - len(pending)} von {len(configs)} Konfigurationen bereits erledigt, {len(pending)} ausstehend.")
+	if not pending:
+		return
+
+	# .npy Cache einmal im Hauptprozess anlegen, damit die Worker nur noch lesen
+	from dataset import MNISTDataset
+	MNISTDataset.from_npz(data_file, "train")
+	MNISTDataset.from_npz(data_file, "test")
+	os.makedirs(model_dir, exist_ok=True)
+
+	workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+	with blas_threads(threads_per_worker):
+		# spawn statt fork: jeder Worker importiert numpy neu und übernimmt dabei die Thread-Limits
+		with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+								 initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+			futures = {pool.submit(run_config, config, data_file, model_dir, dtype): config for config in pending}
+			for done, future in enumerate(as_completed(futures), 1):
+				config = futures[future]
+				try:
+					result = future.result()
+				except Exception as e:
+					# Fehlgeschlagene Läufe werden nicht gespeichert und beim nächsten Start wiederholt
+					print(f"[{done}/{len(pending)}] Fehler bei {config}: {e!r}")
+					continue
+				append_result(results_path, result)
+				print(f"[{done}/{len(pending)}] {config['layer_sizes']}: Genauigkeit {result['accuracy']:.4f}, "
+					  f"{result['samples_per_sec']:.0f} Samples/s, {result['wall_time']:.1f} s")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Hyperparameter- und Architektur-Sweep über mehrere Prozesse")
+	parser.add_argument("--grid", help="JSON-Datei mit Listen pro Hyperparameter (Standard: DEFAULT_GRID)")
+	parser.add_argument("--results", default="sweep_results.jsonl")
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--threads-per-worker", type=int, default=1)
+	parser.add_argument("--data", default="mnist.npz")
+	parser.add_argument("--model-dir", default=".")
+	parser.add_argument("--dtype", default="float32")
+	args = parser.parse_args()
+
+	grid = dict(DEFAULT_GRID)
+	if args.grid:
+		with open(args.grid) as f:
+			grid.update(json.load(f))
+
+	run_sweep(expand_grid(grid), args.results, args.workers, args.threads_per_worker,
+			  args.data, args.model_dir, args.dtype)
+
+
+if __name__ == "__main__":
+	main()